@@ -9,6 +9,9 @@ from .models import DatedValue, DatedValueType
 class DatedValueAdmin(admin.ModelAdmin):
     list_filter = ('type', )
 
+    def queryset(self, request):
+        return super(DatedValueAdmin, self).queryset(request).with_related()
+
 
 admin.site.register(DatedValue, DatedValueAdmin)
 admin.site.register(DatedValueType, TranslatableAdmin)
@@ -0,0 +1,123 @@
+"""Versioned caching for the dated_values app."""
+from time import time
+from uuid import uuid4
+
+from django.core.cache import get_cache
+
+from . import settings
+
+
+# the process-local storage. Maps keys to tuples of
+# ``(version, expiry timestamp, value)``
+_local_cache = {}
+_local_versions = {}
+
+
+def get_backend():
+    """Returns the shared Django cache backend or None if none is set."""
+    if settings.CACHE_BACKEND:
+        return get_cache(settings.CACHE_BACKEND)
+
+
+def get_version_key(version_key):
+    return 'dated_values_version_{0}'.format(version_key)
+
+
+def get_version_timeout():
+    """
+    Returns the timeout of the versions in the shared backend.
+
+    A timeout of None would fall back to the default timeout of the backend,
+    which is usually much shorter than the one of the cached grids. Then the
+    grids would be orphaned long before they expire.
+
+    """
+    return max(settings.GRID_CACHE_TIMEOUT, settings.LOCAL_CACHE_TIMEOUT) * 2
+
+
+def get_version(version_key):
+    """
+    Returns the current version for the given version key.
+
+    If a shared cache backend is configured, the version is stored there, so
+    that it is the same for all processes. It is a random string, that is
+    replaced on every bump. Otherwise we only keep it in the current process.
+
+    """
+    backend = get_backend()
+    if backend is None:
+        return _local_versions.get(version_key, 0)
+    key = get_version_key(version_key)
+    version = backend.get(key)
+    if version is None:
+        # start with a new value, so that entries, which were cached before
+        # the version got evicted from the backend, do not match anymore
+        backend.add(key, uuid4().hex, get_version_timeout())
+        version = backend.get(key)
+    return version
+
+
+def bump_version(version_key):
+    """Invalidates all entries, that are cached under the version key."""
+    _local_versions[version_key] = _local_versions.get(version_key, 0) + 1
+    backend = get_backend()
+    if backend is not None:
+        # unlike incr, which resets the timeout on some backends, a set with
+        # a new random value never reuses a version, even if two processes
+        # bump it at the same time
+        backend.set(get_version_key(version_key), uuid4().hex,
+                    get_version_timeout())
+
+
+def get_or_set(key, version_key, loader):
+    """
+    Returns the locally cached value for ``key``.
+
+    If there is no value for the current version of ``version_key`` or it has
+    expired, ``loader`` is called to create a new value.
+
+    :param key: The key of the cached value.
+    :param version_key: The key of the version, that invalidates the value.
+    :param loader: A callable without arguments, that returns the value.
+
+    """
+    version = get_version(version_key)
+    cached = _local_cache.get(key)
+    if cached is not None and cached[0] == version and cached[1] > time():
+        return cached[2]
+    value = loader()
+    _local_cache[key] = (
+        version, time() + settings.LOCAL_CACHE_TIMEOUT, value)
+    return value
+
+
+def get_or_set_shared(key, version_keys, loader, timeout):
+    """
+    Returns the value for ``key`` from the shared cache backend.
+
+    The versions of all ``version_keys`` are part of the cache key, so that
+    the value is invalidated as soon as one of them is bumped. Without a
+    shared backend nothing is cached and ``loader`` is always called.
+
+    :param key: The key of the cached value.
+    :param version_keys: A list of keys of versions, that invalidate the
+      value.
+    :param loader: A callable without arguments, that returns the value.
+    :param timeout: The timeout of the value in the backend.
+
+    """
+    backend = get_backend()
+    if backend is None:
+        return loader()
+    versioned_key = 'dated_values_{0}_{1}'.format(key, '_'.join(
+        str(get_version(version_key)) for version_key in version_keys))
+    value = backend.get(versioned_key)
+    if value is None:
+        value = loader()
+        backend.set(versioned_key, value, timeout)
+    return value
+
+
+def clear():
+    """Removes all locally cached values."""
+    _local_cache.clear()
@@ -0,0 +1,105 @@
+"""Streaming export of DatedValues."""
+import csv
+import json
+
+from .models import DatedValue
+
+
+FORMATS = ('csv', 'ndjson')
+FIELDS = ('type', 'object_id', 'date', 'value')
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class Echo(object):
+    """File-like object, that returns what is written to it."""
+    def write(self, value):
+        return value
+
+
+def get_export_queryset(ctype=None, slugs=None, object_ids=None, start=None,
+                        end=None):
+    """
+    Returns the DatedValues, that match the given filters.
+
+    :param ctype: An optional ContentType.
+    :param slugs: An optional list of slugs of DatedValueTypes.
+    :param object_ids: An optional list of object ids.
+    :param start: An optional date. Only values from this date on are
+      exported.
+    :param end: An optional date. Only values up to this date are exported.
+
+    """
+    qs = DatedValue.objects.all()
+    if ctype is not None:
+        qs = qs.filter(_ctype=ctype)
+    if slugs:
+        qs = qs.filter(type__slug__in=slugs)
+    if object_ids:
+        qs = qs.filter(object_id__in=object_ids)
+    if start is not None:
+        qs = qs.filter(date__gte=start)
+    if end is not None:
+        qs = qs.filter(date__lte=end)
+    return qs
+
+
+def iter_values(queryset, chunk_size=1000):
+    """
+    Iterates over the values of the queryset in chunks ordered by their pk.
+
+    Every chunk is fetched with its own query starting after the last pk of
+    the previous chunk, so neither the database driver nor Python ever hold
+    more than one chunk of rows in memory.
+
+    Yields tuples of ``(slug, object_id, date, value)``.
+
+    """
+    qs = queryset.order_by('pk').values_list(
+        'pk', 'type__slug', 'object_id', 'date', 'value')
+    last_pk = 0
+    while True:
+        rows = list(qs.filter(pk__gt=last_pk)[:chunk_size])
+        if not rows:
+            return
+        for row in rows:
+            yield row[1:]
+        last_pk = rows[-1][0]
+
+
+def iter_csv(queryset, chunk_size=1000):
+    """Yields the values of the queryset as lines of CSV."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(FIELDS)
+    for slug, object_id, date, value in iter_values(queryset, chunk_size):
+        yield writer.writerow([
+            slug, object_id, date.isoformat() if date else '', value])
+
+
+def iter_ndjson(queryset, chunk_size=1000):
+    """Yields the values of the queryset as lines of JSON objects."""
+    for slug, object_id, date, value in iter_values(queryset, chunk_size):
+        yield json.dumps({
+            'type': slug,
+            'object_id': object_id,
+            'date': date.isoformat() if date else None,
+            'value': str(value),
+        }) + '\n'
+
+
+def iter_export(queryset, fmt='csv', chunk_size=1000):
+    """
+    Yields the lines of the export in the given format.
+
+    :param queryset: A queryset of DatedValues.
+    :param fmt: Either ``csv`` or ``ndjson``.
+    :param chunk_size: The amount of rows to fetch per query.
+
+    """
+    if fmt == 'csv':
+        return iter_csv(queryset, chunk_size)
+    if fmt == 'ndjson':
+        return iter_ndjson(queryset, chunk_size)
+    raise ValueError('Unknown format: {0}'.format(fmt))
@@ -1,43 +1,89 @@
 """Forms of the dated_values app."""
-from decimal import Decimal
+from datetime import datetime
+
 from django import forms
+from django.core.exceptions import ValidationError
 from django.utils.safestring import mark_safe
 
 from dateutil.relativedelta import relativedelta
 
 from .models import DatedValue
+from .utils import get_period_start, get_viewport_dates, normalize_value
 from . import settings
 
 
+#: The resolutions of the management view. Days are edited in the
+#: ``MultiTypeValuesFormset``, weeks and months are shown as aggregates.
+RESOLUTIONS = ('day', 'week', 'month')
+AGGREGATES = ('sum', 'avg', 'min', 'max', 'count')
+
+
+def get_window_values(obj, date, valuetypes, adjacent=True):
+    """
+    Returns the DatedValues of the previous, current and next viewport.
+
+    All values are fetched with a single query and grouped into a dictionary
+    of the form ``{valuetype_id: {date: DatedValue}}``.
+
+    :param obj: An object, that has values attached.
+    :param date: The start date of the current viewport.
+    :param valuetypes: A list of DatedValueTypes of the same content type.
+    :param adjacent: If False, only the values of the current viewport are
+      fetched.
+
+    """
+    window = dict((valuetype.id, {}) for valuetype in valuetypes)
+    if not window:
+        return window
+    dates = get_viewport_dates(date, settings.DISPLAYED_ITEMS)
+    if adjacent:
+        start, end = dates[0], dates[-1]
+    else:
+        start = dates[settings.DISPLAYED_ITEMS]
+        end = dates[settings.DISPLAYED_ITEMS * 2 - 1]
+    values = DatedValue.objects.filter(
+        type__in=window.keys(), date__gte=start, object_id=obj.id,
+        _ctype=valuetypes[0].ctype_id, date__lte=end)
+    for value in values:
+        window[value.type_id][value.date] = value
+    return window
+
+
 class ValuesForm(forms.Form):
     """Form to handle two weeks of DatedValue instances."""
 
-    def __init__(self, obj, date, valuetype, index=None, *args, **kwargs):
+    def __init__(self, obj, date, valuetype, index=None, values=None,
+                 dates=None, *args, **kwargs):
         """
         :param obj: An object, that has values attached.
         :param date: A datetime date.
         :param valuetype: The DatedValueType, we are working on.
-        :param instances: A queryset of DatedValues.
+        :param index: The row of this form inside of a formset.
+        :param values: An optional dictionary of the already fetched
+          DatedValues of the whole window, keyed by their date. If omitted,
+          the form fetches them itself.
+        :param dates: The optional result of ``get_viewport_dates`` for the
+          date. If omitted, the form looks it up itself.
 
         """
         super(ValuesForm, self).__init__(*args, **kwargs)
-        start = date - relativedelta(days=settings.DISPLAYED_ITEMS)
-        end = date + relativedelta(days=settings.DISPLAYED_ITEMS * 2)
-        values = DatedValue.objects.filter(
-            type=valuetype, date__gte=start, object_id=obj.id,
-            _ctype=valuetype.ctype, date__lt=end)
+        if dates is None:
+            dates = get_viewport_dates(date, settings.DISPLAYED_ITEMS)
+        days = settings.DISPLAYED_ITEMS
+        if values is None:
+            values = get_window_values(
+                obj, date, [valuetype],
+                adjacent=settings.ADJACENT_VIEWPORTS)[valuetype.id]
         self.valuetype = valuetype
         self.obj = obj
         self.instances = []
-        for i in range(0, settings.DISPLAYED_ITEMS):
-            current_date = date + relativedelta(days=i)
+        for i, current_date in enumerate(dates[days:days * 2]):
             self.fields['value{0}'.format(i)] = forms.DecimalField(
                 required=False, decimal_places=self.valuetype.decimal_places,
                 widget=forms.TextInput(attrs={
                     'class': 'dated-values-input value-active'}))
-            try:
-                instance = values.get(date=current_date)
-            except DatedValue.DoesNotExist:
+            instance = values.get(current_date)
+            if instance is None:
                 self.instances.append(DatedValue(
                     type=valuetype, object_id=obj.id, date=current_date))
                 self.initial['value{0}'.format(i)] = ''
@@ -45,57 +91,107 @@ class ValuesForm(forms.Form):
                 self.initial['value{0}'.format(i)] = instance.value
                 self.instances.append(instance)
 
-        # add hidden inputs for previous viewport to allow copying from there
         self.values_before = []
-        for i in range(settings.DISPLAYED_ITEMS * -1, 0):
-            current_date = date + relativedelta(days=i)
-            try:
-                instance = values.get(date=current_date)
-            except DatedValue.DoesNotExist:
-                value = ''
-            else:
-                value = instance.value.quantize(
-                    Decimal(
-                        '0' * 24 + '.' + '0' * self.valuetype.decimal_places))
+        self.values_after = []
+        if not settings.ADJACENT_VIEWPORTS:
+            # the adjacent viewports are fetched on demand by the client
+            return
 
+        # add hidden inputs for previous viewport to allow copying from there
+        for i, day in enumerate(dates[:days]):
             self.values_before.append(mark_safe(
                 '<input type="hidden" class="value-before x{0} y{1}" '
                 ' value="{2}" />'.format(
-                    i + settings.DISPLAYED_ITEMS, index, value)))
+                    i, index, self._get_display_value(values, day))))
 
         # add hidden inputs for next viewport to allow copying from there
-        self.values_after = []
-        for i in range(settings.DISPLAYED_ITEMS, settings.DISPLAYED_ITEMS * 2):
-            current_date = date + relativedelta(days=i)
-            try:
-                instance = values.get(date=current_date)
-            except DatedValue.DoesNotExist:
-                value = ''
-            else:
-                value = instance.value.quantize(
-                    Decimal(
-                        '0' * 24 + '.' + '0' * self.valuetype.decimal_places))
-
+        for i, day in enumerate(dates[days * 2:]):
             self.values_after.append(mark_safe(
                 '<input type="hidden" class="value-after x{0} y{1}" '
                 ' value="{2}" />'.format(
-                    i - settings.DISPLAYED_ITEMS, index, value)))
+                    i, index, self._get_display_value(values, day))))
 
-    def save(self, **kwargs):
-        saved_instances = []
-        if self.prefix:
-            prefix = self.prefix + '-'
-        else:
-            prefix = ''
-        for i, instance in enumerate(self.instances):
-            value = self.data.get('{0}value{1}'.format(prefix, i), None)
-            if value:
+    def _get_display_value(self, values, date):
+        """
+        Returns the quantized value for the date.
+
+        :param values: A dictionary of DatedValues keyed by their date.
+
+        """
+        instance = values.get(date)
+        if instance is None:
+            return ''
+        return normalize_value(instance.value, self.valuetype.decimal_places)
+
+    def get_changed_cells(self):
+        """
+        Returns the submitted cells, that differ from their initial value.
+
+        Values are compared as Decimals, so that e.g. ``1.5`` doesn't differ
+        from a stored ``1.50000000``. Returns a list of tuples of the index of
+        the cell and its new value, which is None for emptied cells.
+
+        Read-only and hidden types and cells, that were not submitted at all,
+        never change, since the grid doesn't render inputs for them.
+
+        """
+        changed = []
+        if not self.valuetype.editable or self.valuetype.hidden:
+            return changed
+        for i in range(0, len(self.instances)):
+            name = 'value{0}'.format(i)
+            if self.add_prefix(name) not in self.data:
+                continue
+            field = self.fields[name]
+            value = field.widget.value_from_datadict(
+                self.data, self.files, self.add_prefix(name))
+            try:
+                value = field.to_python(value)
+            except ValidationError:
+                # invalid input always counts as a change to get validated
+                changed.append((i, value))
+                continue
+            initial = self.initial.get(name)
+            if initial == '':
+                initial = None
+            if value != initial:
+                changed.append((i, value))
+        return changed
+
+    def has_changed(self):
+        return bool(self.get_changed_cells())
+
+    def get_changes(self):
+        """
+        Compares the submitted cells against their initial values.
+
+        Returns a tuple of lists with the instances to create, to update and
+        to delete. Unchanged cells are left out.
+
+        """
+        to_create, to_update, to_delete = [], [], []
+        for i, value in self.get_changed_cells():
+            instance = self.instances[i]
+            if value is not None:
                 instance.value = value
-                instance.save()
-                saved_instances.append(instance)
-            elif not value and instance.id is not None:
-                instance.delete()
-        return saved_instances
+                if instance.pk is None:
+                    to_create.append(instance)
+                else:
+                    to_update.append(instance)
+            elif instance.pk is not None:
+                to_delete.append(instance)
+        return to_create, to_update, to_delete
+
+    def save(self, **kwargs):
+        """
+        Saves the changed cells and returns the created and updated values.
+
+        The created values are upserted and have no primary key.
+
+        """
+        to_create, to_update, to_delete = self.get_changes()
+        DatedValue.objects.bulk_write(to_create, to_update, to_delete)
+        return to_create + to_update
 
 
 class MultiTypeValuesFormset(forms.formsets.formset_factory(ValuesForm)):
@@ -103,15 +199,45 @@ class MultiTypeValuesFormset(forms.formsets.formset_factory(ValuesForm)):
         self.obj = obj
         self.date = date
         self.valuetypes = valuetypes
+        self.adjacent_viewports = settings.ADJACENT_VIEWPORTS
+        self.saved_cells = 0
         self.extra = len(self.valuetypes)
-        self.dates = [date + relativedelta(days=i) for i in range(
-            0, settings.DISPLAYED_ITEMS)]
-        self.next_viewport_start_date = date + relativedelta(
-            days=settings.DISPLAYED_ITEMS)
-        self.previous_viewport_start_date = date - relativedelta(
-            days=settings.DISPLAYED_ITEMS)
+        # the dates are computed once and shared by all forms
+        days = settings.DISPLAYED_ITEMS
+        self.viewport_dates = get_viewport_dates(date, days)
+        self.dates = self.viewport_dates[days:days * 2]
+        self.next_viewport_start_date = self.viewport_dates[days * 2]
+        self.previous_viewport_start_date = self.viewport_dates[0]
+        self._values = None
         super(MultiTypeValuesFormset, self).__init__(*args, **kwargs)
 
+    def _construct_forms(self):
+        # the forms are built on first access, so that a cached grid doesn't
+        # need them
+        self._forms = None
+
+    @property
+    def forms(self):
+        if self._forms is None:
+            self._forms = [self._construct_form(i)
+                           for i in range(0, self.total_form_count())]
+        return self._forms
+
+    @property
+    def is_built(self):
+        """True, if the values have been loaded and the forms been built."""
+        return self._forms is not None
+
+    @property
+    def values(self):
+        if self._values is None:
+            # fetch the values of all types at once and hand each form its
+            # share
+            self._values = get_window_values(
+                self.obj, self.date, self.valuetypes,
+                adjacent=self.adjacent_viewports)
+        return self._values
+
     def _construct_form(self, i, **kwargs):
         """
         Instantiates and returns the i-th form instance in a formset.
@@ -124,6 +250,8 @@ class MultiTypeValuesFormset(forms.formsets.formset_factory(ValuesForm)):
             'date': self.date,
             'valuetype': self.valuetypes[i],
             'index': i,
+            'values': self.values[self.valuetypes[i].id],
+            'dates': self.viewport_dates,
         }
         if self.is_bound:
             defaults['data'] = self.data
@@ -137,9 +265,77 @@ class MultiTypeValuesFormset(forms.formsets.formset_factory(ValuesForm)):
         return form
 
     def save(self):
-        saved_instances = []
+        """
+        Saves the changes of all forms with a single batch of queries.
+
+        Returns the created and updated values. The created values are
+        upserted and have no primary key.
+
+        """
+        to_create, to_update, to_delete = [], [], []
         for form in self.forms:
-            saved = form.save()
-            if saved is not None:
-                saved_instances.extend(saved)
-        return saved_instances
+            if not form.has_changed():
+                continue
+            create, update, delete = form.get_changes()
+            to_create.extend(create)
+            to_update.extend(update)
+            to_delete.extend(delete)
+        DatedValue.objects.bulk_write(to_create, to_update, to_delete)
+        self.saved_cells = len(to_create) + len(to_update) + len(to_delete)
+        return to_create + to_update
+
+
+class PeriodValuesTable(object):
+    """
+    Read-only table of the values of all types aggregated per week or month.
+
+    The aggregates of all types are computed with a single query in the
+    database (see ``DatedValue.objects.by_period``). Hidden types are left
+    out.
+
+    """
+    def __init__(self, obj, date, valuetypes, resolution, aggregate='sum'):
+        """
+        :param obj: An object, that has values attached.
+        :param date: A date inside of the first period.
+        :param valuetypes: A list of DatedValueTypes of the same content type.
+        :param resolution: Either ``week`` or ``month``.
+        :param aggregate: One of ``sum``, ``avg``, ``min``, ``max`` or
+          ``count``.
+
+        """
+        if isinstance(date, datetime):
+            date = date.date()
+        self.obj = obj
+        self.resolution = resolution
+        self.aggregate = aggregate
+        self.date = get_period_start(date, resolution)
+        count = settings.DISPLAYED_PERIODS[resolution]
+        step = relativedelta(**{resolution + 's': 1})
+        self.periods = [self.date + step * i for i in range(0, count)]
+        self.next_viewport_start_date = self.date + step * count
+        self.previous_viewport_start_date = self.date - step * count
+        self.valuetypes = [valuetype for valuetype in valuetypes
+                           if not valuetype.hidden]
+        aggregates = {}
+        # the amount of aggregated rows, that were fetched from the database
+        self.fetched_rows = 0
+        if self.valuetypes:
+            rows = DatedValue.objects.filter(
+                type__in=[valuetype.pk for valuetype in self.valuetypes],
+                _ctype=self.valuetypes[0].ctype_id, object_id=obj.pk,
+            ).by_period(resolution, start=self.date,
+                        end=self.next_viewport_start_date - relativedelta(
+                            days=1))
+            self.fetched_rows = len(rows)
+            for row in rows:
+                aggregates[(row['type'], row['period'])] = row[aggregate]
+        self.rows = []
+        for valuetype in self.valuetypes:
+            values = []
+            for period in self.periods:
+                value = aggregates.get((valuetype.pk, period))
+                if aggregate != 'count' and value is not None:
+                    value = normalize_value(value, valuetype.decimal_places)
+                values.append(value)
+            self.rows.append((valuetype, values))
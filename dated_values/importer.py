@@ -0,0 +1,104 @@
+"""Bulk import of DatedValues."""
+import csv
+import json
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+
+from .models import DatedValue, DatedValueType
+
+
+FORMATS = ('csv', 'ndjson')
+
+
+def iter_rows(fileobj, fmt='csv'):
+    """
+    Yields the rows of an export file as dictionaries.
+
+    The file needs the columns ``type`` (the slug), ``object_id``, ``date``
+    (``YYYY-MM-DD`` or empty) and ``value`` as written by the export.
+
+    :param fileobj: An open file.
+    :param fmt: Either ``csv`` or ``ndjson``.
+
+    """
+    if fmt == 'csv':
+        return csv.DictReader(fileobj)
+    if fmt == 'ndjson':
+        return (json.loads(line) for line in fileobj if line.strip())
+    raise ValueError('Unknown format: {0}'.format(fmt))
+
+
+class ValuesImporter(object):
+    """
+    Upserts rows of DatedValues in batches.
+
+    Types are resolved by their slug with one query per batch for all slugs,
+    that were not seen before. Every batch is then written with
+    ``DatedValue.objects.bulk_upsert``.
+
+    """
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.valuetypes = {}
+        self.rows = 0
+
+    def get_valuetypes(self, slugs):
+        missing = set(slugs) - set(self.valuetypes.keys())
+        if missing:
+            for valuetype in DatedValueType.objects.filter(slug__in=missing):
+                self.valuetypes[valuetype.slug] = valuetype
+        return self.valuetypes
+
+    def to_value(self, row, number):
+        """Converts a row to an unsaved and validated DatedValue."""
+        valuetype = self.valuetypes.get(row.get('type'))
+        if valuetype is None:
+            raise ValidationError('Row {0}: Unknown type "{1}".'.format(
+                number, row.get('type')))
+        try:
+            value = DatedValue(
+                type=valuetype, object_id=int(row['object_id']),
+                value=Decimal(str(row['value'])))
+            if row.get('date'):
+                value.date = datetime.strptime(
+                    row['date'], '%Y-%m-%d').date()
+        except (KeyError, TypeError, ValueError, InvalidOperation):
+            raise ValidationError('Row {0}: Invalid row {1}.'.format(
+                number, row))
+        try:
+            value.clean()
+        except ValidationError as ex:
+            raise ValidationError('Row {0}: {1}'.format(
+                number, ' '.join(ex.messages)))
+        return value
+
+    def import_batch(self, rows, first_number):
+        self.get_valuetypes([row.get('type') for row in rows])
+        values = {}
+        for number, row in enumerate(rows, first_number):
+            value = self.to_value(row, number)
+            values[(value.type_id, value.object_id, value.date)] = value
+        DatedValue.objects.bulk_upsert(values.values())
+        self.rows += len(rows)
+
+    def run(self, rows):
+        """
+        Imports all rows.
+
+        Raises a ``ValidationError`` for the first invalid row. All batches
+        before the one with the invalid row are already imported.
+
+        :param rows: An iterable of row dictionaries.
+
+        """
+        rows = iter(rows)
+        number = 1
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                return self.rows
+            self.import_batch(batch, number)
+            number += len(batch)
@@ -0,0 +1,68 @@
+"""Exports DatedValues as CSV or NDJSON."""
+from datetime import datetime
+from optparse import make_option
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+
+from ... import settings
+from ...export import FORMATS, get_export_queryset, iter_export
+
+
+class Command(BaseCommand):
+    help = 'Streams DatedValues to a file or to stdout.'
+    option_list = BaseCommand.option_list + (
+        make_option('--format', dest='format', default='csv',
+                    help='The output format. Either csv or ndjson.'),
+        make_option('--output', dest='output', default=None,
+                    help='The file to write to. Defaults to stdout.'),
+        make_option('--ctype', dest='ctype', default=None,
+                    help='Only export values of this content type id.'),
+        make_option('--types', dest='types', default=None,
+                    help='A comma separated list of type slugs.'),
+        make_option('--objects', dest='objects', default=None,
+                    help='A comma separated list of object ids.'),
+        make_option('--start', dest='start', default=None,
+                    help='Only export values from this date on.'),
+        make_option('--end', dest='end', default=None,
+                    help='Only export values up to this date.'),
+        make_option('--chunk-size', dest='chunk_size', default=1000,
+                    type='int', help='The amount of rows per query.'),
+    )
+
+    def parse_date(self, value):
+        if value:
+            try:
+                return datetime.strptime(value, settings.DATE_FORMAT).date()
+            except ValueError:
+                raise CommandError('Dates must have the format {0}.'.format(
+                    settings.DATE_FORMAT))
+
+    def handle(self, *args, **options):
+        if options['format'] not in FORMATS:
+            raise CommandError('The format must be one of {0}.'.format(
+                ', '.join(FORMATS)))
+        ctype = None
+        if options['ctype']:
+            try:
+                ctype = ContentType.objects.get_for_id(options['ctype'])
+            except ContentType.DoesNotExist:
+                raise CommandError('The content type does not exist.')
+        queryset = get_export_queryset(
+            ctype=ctype,
+            slugs=options['types'] and options['types'].split(','),
+            object_ids=options['objects'] and options['objects'].split(','),
+            start=self.parse_date(options['start']),
+            end=self.parse_date(options['end']),
+        )
+        if options['output']:
+            output = open(options['output'], 'w')
+        else:
+            output = self.stdout
+        try:
+            for line in iter_export(
+                    queryset, options['format'], options['chunk_size']):
+                output.write(line)
+        finally:
+            if options['output']:
+                output.close()
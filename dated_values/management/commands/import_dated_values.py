@@ -0,0 +1,44 @@
+"""Imports DatedValues from CSV or NDJSON files."""
+from optparse import make_option
+from time import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from ...importer import FORMATS, ValuesImporter, iter_rows
+
+
+class Command(BaseCommand):
+    args = '<file>'
+    help = ('Creates or updates DatedValues from a file with the columns'
+            ' type, object_id, date and value.')
+    option_list = BaseCommand.option_list + (
+        make_option('--format', dest='format', default=None,
+                    help=('The input format. Either csv or ndjson. Defaults'
+                          ' to the file extension.')),
+        make_option('--batch-size', dest='batch_size', default=1000,
+                    type='int', help='The amount of rows per batch.'),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError('Please provide the file to import.')
+        filename = args[0]
+        fmt = options['format'] or filename.rsplit('.', 1)[-1]
+        if fmt not in FORMATS:
+            raise CommandError('The format must be one of {0}.'.format(
+                ', '.join(FORMATS)))
+        importer = ValuesImporter(batch_size=options['batch_size'])
+        start = time()
+        try:
+            with open(filename) as fileobj:
+                importer.run(iter_rows(fileobj, fmt))
+        except IOError as ex:
+            raise CommandError(ex)
+        except ValidationError as ex:
+            raise CommandError(' '.join(ex.messages))
+        duration = max(time() - start, 0.001)
+        if int(options.get('verbosity', 1)) > 0:
+            self.stdout.write(
+                'Imported {0} rows in {1:.2f}s ({2:.0f} rows/s).'.format(
+                    importer.rows, duration, importer.rows / duration))
@@ -0,0 +1,14 @@
+"""Rebuilds the monthly rollups of all DatedValues."""
+from django.core.management.base import NoArgsCommand
+
+from ...models import DatedValueRollup
+
+
+class Command(NoArgsCommand):
+    help = 'Deletes all DatedValueRollups and creates them from scratch.'
+
+    def handle_noargs(self, **options):
+        DatedValueRollup.objects.rebuild()
+        if int(options.get('verbosity', 1)) > 0:
+            self.stdout.write('Created {0} rollups.'.format(
+                DatedValueRollup.objects.count()))
@@ -0,0 +1,92 @@
+"""
+Instrumentation of the views of the dated_values app.
+
+When ``DATED_VALUES_METRICS_CALLBACK`` is set or a receiver is connected to
+the ``view_measured`` signal, the ``ValuesManagementView`` counts the queries,
+the loaded values, the built forms and the saved cells of every request and
+reports them as a dictionary. Otherwise nothing is measured.
+
+"""
+from timeit import default_timer
+
+from django.db import connections, router
+
+from . import settings
+from .models import DatedValue
+from .signals import view_measured
+
+
+def is_enabled():
+    """Returns True, if anyone is interested in the metrics."""
+    return bool(settings.METRICS_CALLBACK or view_measured.receivers)
+
+
+class QueryCounter(object):
+    """
+    Context manager, that counts the queries on a database connection.
+
+    It enables the debug cursor of the connection, which records the queries
+    even if ``DEBUG`` is False, and restores it afterwards.
+
+    """
+    def __init__(self, using=None):
+        if using is None:
+            using = router.db_for_read(DatedValue)
+        self.connection = connections[using]
+        self.count = 0
+
+    def __enter__(self):
+        self.use_debug_cursor = self.connection.use_debug_cursor
+        self.connection.use_debug_cursor = True
+        self.start = len(self.connection.queries)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.connection.use_debug_cursor = self.use_debug_cursor
+        # the queries are reset when a request starts, e.g. in tests
+        self.count = max(len(self.connection.queries) - self.start, 0)
+
+
+def report(sender, request, metrics):
+    """Hands the metrics to the callback and sends ``view_measured``."""
+    if settings.METRICS_CALLBACK:
+        settings.METRICS_CALLBACK(request, metrics)
+    view_measured.send(sender=sender, request=request, metrics=metrics)
+
+
+def measure(view, dispatch, request, *args, **kwargs):
+    """
+    Calls the dispatch method of a view and reports its metrics.
+
+    The view can provide the ``formset`` and the ``table`` it has built.
+
+    """
+    started = default_timer()
+    with QueryCounter() as counter:
+        response = dispatch(request, *args, **kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            # include the rendering of template responses
+            response = response.render()
+    metrics = {
+        'view': view.__class__.__name__,
+        'method': request.method,
+        'status_code': response.status_code,
+        'ctype_id': getattr(view, 'ctype', None) and view.ctype.pk,
+        'object_id': kwargs.get('object_id'),
+        'valuetypes': len(getattr(view, 'valuetypes', [])),
+        'queries': counter.count,
+        'rows': 0,
+        'forms': 0,
+        'cells_saved': 0,
+    }
+    formset = getattr(view, 'formset', None)
+    if formset is not None and formset.is_built:
+        metrics['rows'] = sum(len(values) for values in formset.values.values())
+        metrics['forms'] = len(formset.forms)
+        metrics['cells_saved'] = formset.saved_cells
+    table = getattr(view, 'table', None)
+    if table is not None:
+        metrics['rows'] = table.fetched_rows
+    metrics['time'] = default_timer() - started
+    report(view.__class__, request, metrics)
+    return response
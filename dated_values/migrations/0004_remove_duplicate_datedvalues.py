@@ -0,0 +1,68 @@
+# flake8: noqa
+# -*- coding: utf-8 -*-
+from south.utils import datetime_utils as datetime
+from south.db import db
+from south.v2 import DataMigration
+from django.db import models
+
+
+class Migration(DataMigration):
+
+    def forwards(self, orm):
+        """
+        Removes duplicate DatedValues before the unique constraint is added.
+
+        Of all values with the same type, object and date only the newest one
+        (the one with the highest id) is kept. Undated values are not covered
+        by the constraint and are left alone.
+
+        """
+        duplicates = orm['dated_values.DatedValue'].objects.filter(
+            date__isnull=False,
+        ).values('type', 'object_id', 'date').annotate(
+            count=models.Count('id'), newest=models.Max('id'),
+        ).filter(count__gt=1).order_by()
+        for row in duplicates:
+            orm['dated_values.DatedValue'].objects.filter(
+                type=row['type'], object_id=row['object_id'], date=row['date'],
+            ).exclude(pk=row['newest']).delete()
+
+    def backwards(self, orm):
+        "The removed duplicates cannot be restored."
+
+    models = {
+        u'contenttypes.contenttype': {
+            'Meta': {'ordering': "('name',)", 'unique_together': "(('app_label', 'model'),)", 'object_name': 'ContentType', 'db_table': "'django_content_type'"},
+            'app_label': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'model': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '100'})
+        },
+        u'dated_values.datedvalue': {
+            'Meta': {'ordering': "['date']", 'object_name': 'DatedValue'},
+            '_ctype': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['contenttypes.ContentType']"}),
+            'date': ('django.db.models.fields.DateField', [], {'null': 'True', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'object_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'type': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['dated_values.DatedValueType']"}),
+            'value': ('django.db.models.fields.DecimalField', [], {'max_digits': '24', 'decimal_places': '8'})
+        },
+        u'dated_values.datedvaluetype': {
+            'Meta': {'object_name': 'DatedValueType'},
+            'ctype': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['contenttypes.ContentType']"}),
+            'decimal_places': ('django.db.models.fields.PositiveIntegerField', [], {'default': '2'}),
+            'editable': ('django.db.models.fields.BooleanField', [], {'default': 'True'}),
+            'hidden': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'slug': ('django.db.models.fields.SlugField', [], {'unique': 'True', 'max_length': '64'})
+        },
+        u'dated_values.datedvaluetypetranslation': {
+            'Meta': {'unique_together': "[('language_code', 'master')]", 'object_name': 'DatedValueTypeTranslation', 'db_table': "u'dated_values_datedvaluetype_translation'"},
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'language_code': ('django.db.models.fields.CharField', [], {'max_length': '15', 'db_index': 'True'}),
+            'master': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "'translations'", 'null': 'True', 'to': u"orm['dated_values.DatedValueType']"}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '256'})
+        }
+    }
+
+    complete_apps = ['dated_values']
@@ -0,0 +1,91 @@
+# flake8: noqa
+# -*- coding: utf-8 -*-
+from south.utils import datetime_utils as datetime
+from south.db import db
+from south.v2 import SchemaMigration
+from django.db import models
+
+
+class Migration(SchemaMigration):
+
+    def forwards(self, orm):
+        # Adding model 'DatedValueRollup'
+        db.create_table(u'dated_values_datedvaluerollup', (
+            (u'id', self.gf('django.db.models.fields.AutoField')(primary_key=True)),
+            ('_ctype', self.gf('django.db.models.fields.related.ForeignKey')(to=orm['contenttypes.ContentType'])),
+            ('count', self.gf('django.db.models.fields.PositiveIntegerField')()),
+            ('max', self.gf('django.db.models.fields.DecimalField')(max_digits=24, decimal_places=8)),
+            ('min', self.gf('django.db.models.fields.DecimalField')(max_digits=24, decimal_places=8)),
+            ('object_id', self.gf('django.db.models.fields.PositiveIntegerField')()),
+            ('period', self.gf('django.db.models.fields.DateField')()),
+            ('sum', self.gf('django.db.models.fields.DecimalField')(max_digits=32, decimal_places=8)),
+            ('type', self.gf('django.db.models.fields.related.ForeignKey')(to=orm['dated_values.DatedValueType'])),
+        ))
+        db.send_create_signal(u'dated_values', ['DatedValueRollup'])
+
+        # Adding unique constraint on 'DatedValueRollup', fields ['type', 'object_id', 'period']
+        db.create_unique(u'dated_values_datedvaluerollup', ['type_id', 'object_id', 'period'])
+
+        # Adding index on 'DatedValueRollup', fields ['type', '_ctype', 'object_id', 'period']
+        db.create_index(u'dated_values_datedvaluerollup', ['type_id', '_ctype_id', 'object_id', 'period'])
+
+
+    def backwards(self, orm):
+        # Removing index on 'DatedValueRollup', fields ['type', '_ctype', 'object_id', 'period']
+        db.delete_index(u'dated_values_datedvaluerollup', ['type_id', '_ctype_id', 'object_id', 'period'])
+
+        # Removing unique constraint on 'DatedValueRollup', fields ['type', 'object_id', 'period']
+        db.delete_unique(u'dated_values_datedvaluerollup', ['type_id', 'object_id', 'period'])
+
+        # Deleting model 'DatedValueRollup'
+        db.delete_table(u'dated_values_datedvaluerollup')
+
+
+    models = {
+        u'contenttypes.contenttype': {
+            'Meta': {'ordering': "('name',)", 'unique_together': "(('app_label', 'model'),)", 'object_name': 'ContentType', 'db_table': "'django_content_type'"},
+            'app_label': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'model': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '100'})
+        },
+        u'dated_values.datedvalue': {
+            'Meta': {'ordering': "['date']", 'unique_together': "[('type', 'object_id', 'date')]", 'object_name': 'DatedValue'},
+            '_ctype': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['contenttypes.ContentType']"}),
+            'date': ('django.db.models.fields.DateField', [], {'null': 'True', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'object_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'type': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['dated_values.DatedValueType']"}),
+            'value': ('django.db.models.fields.DecimalField', [], {'max_digits': '24', 'decimal_places': '8'})
+        },
+        u'dated_values.datedvaluerollup': {
+            'Meta': {'ordering': "['period']", 'unique_together': "[('type', 'object_id', 'period')]", 'object_name': 'DatedValueRollup', 'index_together': "[('type', '_ctype', 'object_id', 'period')]"},
+            '_ctype': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['contenttypes.ContentType']"}),
+            'count': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'max': ('django.db.models.fields.DecimalField', [], {'max_digits': '24', 'decimal_places': '8'}),
+            'min': ('django.db.models.fields.DecimalField', [], {'max_digits': '24', 'decimal_places': '8'}),
+            'object_id': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'period': ('django.db.models.fields.DateField', [], {}),
+            'sum': ('django.db.models.fields.DecimalField', [], {'max_digits': '32', 'decimal_places': '8'}),
+            'type': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['dated_values.DatedValueType']"})
+        },
+        u'dated_values.datedvaluetype': {
+            'Meta': {'object_name': 'DatedValueType'},
+            'ctype': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['contenttypes.ContentType']"}),
+            'decimal_places': ('django.db.models.fields.PositiveIntegerField', [], {'default': '2'}),
+            'editable': ('django.db.models.fields.BooleanField', [], {'default': 'True'}),
+            'hidden': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'slug': ('django.db.models.fields.SlugField', [], {'unique': 'True', 'max_length': '64'})
+        },
+        u'dated_values.datedvaluetypetranslation': {
+            'Meta': {'unique_together': "[('language_code', 'master')]", 'object_name': 'DatedValueTypeTranslation', 'db_table': "u'dated_values_datedvaluetype_translation'"},
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'language_code': ('django.db.models.fields.CharField', [], {'max_length': '15', 'db_index': 'True'}),
+            'master': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "'translations'", 'null': 'True', 'to': u"orm['dated_values.DatedValueType']"}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '256'})
+        }
+    }
+
+    complete_apps = ['dated_values']
\ No newline at end of file
@@ -1,16 +1,45 @@
 """Just an empty models file to let the testrunner recognize this as app."""
+from collections import OrderedDict
+from copy import copy
+from datetime import date, datetime
 from decimal import Decimal
+from itertools import islice
 
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes import generic
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models import Avg, Count, Max, Min, Q, Sum
+from django.db.models.query import QuerySet
+from django.db.models.signals import post_delete, post_save
 from django.core.exceptions import ValidationError
+from django.utils.timezone import now
 from django.utils.translation import get_language, ugettext_lazy as _
 
+from dateutil.relativedelta import relativedelta
+
 from hvad.descriptors import LanguageCodeAttribute, TranslatedAttribute
+from hvad.manager import TranslationManager
 from hvad.models import TranslatableModel, TranslatedFields
 
+from . import settings
+from .cache import bump_version, get_or_set
+from .signals import values_changed
+from .utils import (
+    PERIODS,
+    get_period_start,
+    get_period_starts,
+    normalize_value,
+)
+
+
+VALUETYPES_VERSION_KEY = 'valuetypes'
+
+
+def get_values_version_key(ctype_id, object_id):
+    """Returns the version key of the values of one object."""
+    return 'values_{0}_{1}'.format(ctype_id, object_id)
+
 
 # When using the TranslatableModel class, it still uses the default Django
 # related manager for some reason instead of the translation aware one. It
@@ -83,6 +112,552 @@ class BetterTranslatedAttributeMixin(object):
             setattr(cls, field.name, attr)
 
 
+class TranslationsQuerySetMixin(object):
+    """
+    Queryset mixin, that fills the translations of DatedValueTypes.
+
+    If ``translations_language`` is set, the results are fetched in chunks
+    and the translations of the types in each chunk are loaded with one
+    query. Subclasses return the types of a chunk in
+    ``get_translated_valuetypes``.
+
+    """
+    translations_language = None
+    translations_chunk_size = 100
+
+    def _clone(self, *args, **kwargs):
+        kwargs.setdefault('translations_language', self.translations_language)
+        return super(TranslationsQuerySetMixin, self)._clone(*args, **kwargs)
+
+    def iterator(self):
+        iterator = super(TranslationsQuerySetMixin, self).iterator()
+        if self.translations_language is None:
+            return iterator
+        return self._translated_iterator(iterator)
+
+    def _translated_iterator(self, iterator):
+        while True:
+            chunk = list(islice(iterator, self.translations_chunk_size))
+            if not chunk:
+                return
+            fill_translations(self.get_translated_valuetypes(chunk),
+                              self.translations_language)
+            for obj in chunk:
+                yield obj
+
+    def get_translated_valuetypes(self, chunk):
+        """
+        Returns the DatedValueTypes of a chunk of results.
+
+        Subclasses must implement this method.
+
+        :param chunk: A list of results of the queryset.
+
+        """
+        raise NotImplementedError(
+            'Subclasses must implement get_translated_valuetypes.')
+
+
+# SQL, that truncates a date column to the monday of its week, per vendor
+WEEK_TRUNC_SQL = {
+    'mysql': 'DATE_SUB({0}, INTERVAL WEEKDAY({0}) DAY)',
+    'oracle': "TRUNC({0}, 'IW')",
+    'postgresql': "DATE_TRUNC('week', {0})",
+    'sqlite': (
+        "DATE({0}, '-' || ((CAST(STRFTIME('%%w', {0}) AS INTEGER) + 6) %% 7)"
+        " || ' days')"),
+}
+
+
+def get_period_sql(connection, period, column):
+    """
+    Returns the SQL, that truncates the date column to the start of a period.
+
+    :param connection: The database connection.
+    :param period: One of ``day``, ``week``, ``month`` or ``year``.
+    :param column: The quoted name of the date column.
+
+    """
+    if period not in PERIODS:
+        raise ValueError('Unknown period: {0}'.format(period))
+    if period == 'week':
+        try:
+            return WEEK_TRUNC_SQL[connection.vendor].format(column)
+        except KeyError:
+            raise NotImplementedError(
+                'Weekly aggregation is not supported on {0}.'.format(
+                    connection.vendor))
+    return connection.ops.date_trunc_sql(period, column)
+
+
+def to_date(value):
+    """Converts a truncated date returned by the database to a date."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value[:10], '%Y-%m-%d').date()
+
+
+# Matches the latest dated value of a series on or before a date or, if
+# there is none, the undated value of the series.
+AS_OF_SQL = (
+    '{table}.{date} = (SELECT MAX(asof.{date}) FROM {table} asof'
+    ' WHERE {series} AND asof.{date} <= %s)'
+    ' OR ({table}.{date} IS NULL AND NOT EXISTS (SELECT 1 FROM {table} asof'
+    ' WHERE {series} AND asof.{date} <= %s))'
+)
+
+# Selects the value of one type, that applies on a date, for the objects of
+# another table. Dated values come first, the undated value last.
+ANNOTATE_AS_OF_SQL = (
+    'SELECT asof.{value} FROM {table} asof'
+    ' INNER JOIN {type_table} asof_type ON asof.{type_id} = asof_type.{id}'
+    ' WHERE asof_type.{slug} = %s AND asof.{ctype_id} = %s'
+    ' AND asof.{object_id} = {target_table}.{target_pk}'
+    ' AND (asof.{date} <= %s OR asof.{date} IS NULL)'
+    ' ORDER BY CASE WHEN asof.{date} IS NULL THEN 1 ELSE 0 END,'
+    ' asof.{date} DESC LIMIT 1'
+)
+
+
+UPSERT_BATCH_SIZE = 100
+
+# Native upserts on the unique (type, object_id, date) constraint per vendor
+UPSERT_SQL = {
+    'mysql': (
+        'INSERT INTO {table} ({columns}) VALUES {{values}}'
+        ' ON DUPLICATE KEY UPDATE {value} = VALUES({value}),'
+        ' {modified} = VALUES({modified})'),
+    'postgresql': (
+        'INSERT INTO {table} ({columns}) VALUES {{values}}'
+        ' ON CONFLICT ({type_id}, {object_id}, {date})'
+        ' DO UPDATE SET {value} = EXCLUDED.{value},'
+        ' {modified} = EXCLUDED.{modified}'),
+}
+UPSERT_SQL['sqlite'] = UPSERT_SQL['postgresql']
+
+
+def get_upsert_sql(connection, table):
+    """
+    Returns the SQL for a native upsert or None if it is not supported.
+
+    The returned SQL still contains a ``{values}`` placeholder for the rows.
+
+    """
+    vendor = connection.vendor
+    if vendor == 'postgresql' and connection.pg_version < 90500:
+        return None
+    if vendor == 'sqlite':
+        from django.db.backends.sqlite3.base import Database
+        if Database.sqlite_version_info < (3, 24, 0):
+            return None
+    if vendor not in UPSERT_SQL:
+        return None
+    qn = connection.ops.quote_name
+    return UPSERT_SQL[vendor].format(
+        table=qn(table),
+        columns=', '.join(qn(column) for column in (
+            'type_id', '_ctype_id', 'object_id', 'date', 'value',
+            'modified')),
+        type_id=qn('type_id'), object_id=qn('object_id'), date=qn('date'),
+        value=qn('value'), modified=qn('modified'))
+
+
+class DatedValueQuerySet(TranslationsQuerySetMixin, QuerySet):
+    """Custom queryset for the ``DatedValue`` model."""
+
+    def get_translated_valuetypes(self, chunk):
+        return [value.type for value in chunk]
+
+    def delete(self):
+        """
+        Deletes the values and sends ``values_changed`` for them.
+
+        The keys of the values are fetched before, so that the rollups and
+        the caches of their objects can be updated. This also covers the
+        "delete selected" action of the admin.
+
+        """
+        values = [self.model(type_id=type_id, _ctype_id=ctype_id,
+                             object_id=object_id, date=day)
+                  for type_id, ctype_id, object_id, day in self.values_list(
+                      'type', '_ctype', 'object_id', 'date')]
+        super(DatedValueQuerySet, self).delete()
+        if values:
+            values_changed.send(sender=self.model, values=values)
+    delete.alters_data = True
+
+    def with_related(self, language_code=None):
+        """
+        Loads everything, that is needed to display the values.
+
+        The types and content types are joined, the translations of the types
+        are loaded with one query per chunk of values and the related objects
+        are prefetched with one query per content type. Afterwards neither
+        ``__unicode__`` nor ``normal_value`` hit the database.
+
+        :param language_code: The language code for the names of the types.
+          Defaults to the current language.
+
+        """
+        return self.select_related(
+            'type__ctype', '_ctype',
+        ).prefetch_related('object')._clone(
+            translations_language=language_code or get_language())
+
+    def as_of(self, date):
+        """
+        Returns the values, that apply on the given date.
+
+        For every object and type that is the value with the latest date on
+        or before ``date`` or, if there is none, the value without a date.
+        The lookup is done with a correlated subquery, which is covered by the
+        unique index on type, object and date.
+
+        :param date: A date.
+
+        """
+        if isinstance(date, datetime):
+            date = date.date()
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        table = qn(self.model._meta.db_table)
+        series = ' AND '.join(
+            'asof.{0} = {1}.{0}'.format(qn(column), table)
+            for column in ('type_id', '_ctype_id', 'object_id'))
+        sql = AS_OF_SQL.format(table=table, date=qn('date'), series=series)
+        db_date = connection.ops.value_to_db_date(date)
+        return self.extra(where=[sql], params=[db_date, db_date])
+
+    def by_period(self, period='month', start=None, end=None,
+                  fill_gaps=False):
+        """
+        Aggregates the values per object, type and period in the database.
+
+        Returns a list of dictionaries with the keys ``object_id``, ``type``
+        (the id of the type), ``period`` (the first day of the period),
+        ``sum``, ``avg``, ``min``, ``max`` and ``count``, ordered by object,
+        type and period. All aggregates except ``count`` are Decimals. Values
+        without a date are ignored.
+
+        :param period: One of ``day``, ``week``, ``month`` or ``year``.
+        :param start: An optional date. Only values from this date on are
+          aggregated.
+        :param end: An optional date. Only values up to this date are
+          aggregated.
+        :param fill_gaps: If True, periods without values are added with a
+          count of 0 and None for all other aggregates. They are added from
+          the period of ``start`` to the period of ``end`` or, if those are
+          omitted, between the first and the last period of each object and
+          type.
+
+        """
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        column = '{0}.{1}'.format(
+            qn(self.model._meta.db_table), qn('date'))
+        qs = self.filter(date__isnull=False)
+        if start is not None:
+            qs = qs.filter(date__gte=start)
+        if end is not None:
+            qs = qs.filter(date__lte=end)
+        rows = qs.extra(
+            select={'period': get_period_sql(connection, period, column)},
+        ).values('object_id', 'type', 'period').annotate(
+            sum=Sum('value'), avg=Avg('value'), min=Min('value'),
+            max=Max('value'), count=Count('pk'),
+        ).order_by('object_id', 'type', 'period')
+        result = []
+        for row in rows:
+            row['period'] = to_date(row['period'])
+            # some databases return the average as a float
+            if row['avg'] is not None:
+                row['avg'] = Decimal(str(row['avg']))
+            result.append(row)
+        if fill_gaps:
+            result = self._fill_gaps(result, period, start, end)
+        return result
+
+    def _fill_gaps(self, rows, period, start, end):
+        series = OrderedDict()
+        for row in rows:
+            series.setdefault((row['object_id'], row['type']), {})[
+                row['period']] = row
+        result = []
+        for (object_id, type_id), periods in series.items():
+            first = start if start is not None else min(periods)
+            last = end if end is not None else max(periods)
+            for period_start in get_period_starts(first, last, period):
+                row = periods.get(period_start)
+                if row is None:
+                    row = {
+                        'object_id': object_id, 'type': type_id,
+                        'period': period_start, 'sum': None, 'avg': None,
+                        'min': None, 'max': None, 'count': 0,
+                    }
+                result.append(row)
+        return result
+
+
+class DatedValueManager(models.Manager):
+    """Custom manager for the ``DatedValue`` model."""
+
+    def get_query_set(self):
+        return DatedValueQuerySet(self.model, using=self._db)
+
+    def as_of(self, date):
+        return self.get_query_set().as_of(date)
+
+    def by_period(self, *args, **kwargs):
+        return self.get_query_set().by_period(*args, **kwargs)
+
+    def annotate_values_as_of(self, queryset, slugs, date):
+        """
+        Adds the values, that apply on the date, to a queryset of objects.
+
+        Every slug is selected as a subquery, so the objects and their values
+        are fetched with one query. The attributes are named like the slugs
+        with dashes replaced by underscores and hold the raw value as returned
+        by the database or None.
+
+        :param queryset: A queryset of the model, that has values attached.
+        :param slugs: A list of slugs of DatedValueTypes.
+        :param date: A date.
+
+        """
+        if isinstance(date, datetime):
+            date = date.date()
+        connection = connections[queryset.db]
+        qn = connection.ops.quote_name
+        sql = ANNOTATE_AS_OF_SQL.format(
+            table=qn(self.model._meta.db_table),
+            type_table=qn(DatedValueType._meta.db_table),
+            target_table=qn(queryset.model._meta.db_table),
+            target_pk=qn(queryset.model._meta.pk.column),
+            value=qn('value'), type_id=qn('type_id'), id=qn('id'),
+            slug=qn('slug'), ctype_id=qn('_ctype_id'),
+            object_id=qn('object_id'), date=qn('date'))
+        ctype = ContentType.objects.get_for_model(queryset.model)
+        db_date = connection.ops.value_to_db_date(date)
+        select = OrderedDict()
+        select_params = []
+        for slug in slugs:
+            select[slug.replace('-', '_')] = sql
+            select_params.extend([slug, ctype.pk, db_date])
+        return queryset.extra(select=select, select_params=select_params)
+
+    def get_values_as_of(self, objects, slugs, date):
+        """
+        Returns the values of many types, that apply on the date.
+
+        The values are fetched with one query and returned normalized as a
+        dictionary of the form ``{object_id: {slug: Decimal}}``. Objects
+        without any values are left out.
+
+        :param objects: A queryset of objects or a list of object ids.
+        :param slugs: A list of slugs of DatedValueTypes.
+        :param date: A date.
+
+        """
+        qs = self.filter(type__slug__in=list(slugs))
+        if isinstance(objects, QuerySet):
+            qs = qs.filter(
+                _ctype=ContentType.objects.get_for_model(objects.model),
+                object_id__in=objects.values('pk'))
+        else:
+            qs = qs.filter(object_id__in=list(objects))
+        rows = qs.as_of(date).values_list(
+            'object_id', 'type__slug', 'type__decimal_places', 'value')
+        result = {}
+        for object_id, slug, decimal_places, value in rows:
+            result.setdefault(object_id, {})[slug] = normalize_value(
+                value, decimal_places)
+        return result
+
+    def with_related(self, language_code=None):
+        return self.get_query_set().with_related(language_code)
+
+    def value_as_of(self, obj, valuetype, date):
+        """
+        Returns the DatedValue of the object, that applies on the date.
+
+        Returns None if there is none.
+
+        :param obj: The object, that has values attached.
+        :param valuetype: The DatedValueType.
+        :param date: A date.
+
+        """
+        return self.values_as_of([obj.pk], valuetype, date).get(obj.pk)
+
+    def values_as_of(self, object_ids, valuetype, date):
+        """
+        Returns the DatedValues of many objects, that apply on the date.
+
+        All values are fetched with one query and returned as a dictionary of
+        the form ``{object_id: DatedValue}``. Objects without a value are left
+        out.
+
+        :param object_ids: A list of ids of objects of the type's ctype.
+        :param valuetype: The DatedValueType.
+        :param date: A date.
+
+        """
+        values = self.filter(
+            type=valuetype, _ctype=valuetype.ctype_id,
+            object_id__in=list(object_ids)).as_of(date)
+        return dict((value.object_id, value) for value in values)
+
+    def bulk_write(self, to_create=None, to_update=None, to_delete=None):
+        """
+        Writes a batch of changed DatedValues in a single transaction.
+
+        New values are upserted (see ``bulk_upsert``), so that values, which
+        were created by someone else in the meantime, are updated instead of
+        duplicated. Like with ``bulk_upsert`` their primary keys are not set.
+        Updated values are written with one ``UPDATE`` per distinct value and
+        removed values are deleted with one ``DELETE``.
+
+        :param to_create: A list of unsaved DatedValue instances.
+        :param to_update: A list of saved DatedValue instances with a new value.
+        :param to_delete: A list of saved DatedValue instances to remove.
+
+        """
+        to_create = list(to_create or [])
+        to_update = list(to_update or [])
+        to_delete = list(to_delete or [])
+        with transaction.commit_on_success(using=self.db):
+            if to_create:
+                self._upsert(to_create)
+            pks_by_value = {}
+            for instance in to_update:
+                pks_by_value.setdefault(instance.value, []).append(instance.pk)
+            for value, pks in pks_by_value.items():
+                self.filter(pk__in=pks).update(value=value, modified=now())
+            if to_delete:
+                # the deleted instances are known, so the signal of the
+                # queryset is not needed
+                super(DatedValueQuerySet, self.filter(
+                    pk__in=[instance.pk for instance in to_delete])).delete()
+                for instance in to_delete:
+                    instance.pk = None
+        values = to_create + to_update + to_delete
+        if values:
+            # after the commit, so that the caches are not invalidated before
+            # the new values are visible
+            values_changed.send(sender=self.model, values=values)
+
+    def upsert(self, type, object_id, date, value):
+        """
+        Creates or updates the value of the type for the object and date.
+
+        :param type: The DatedValueType.
+        :param object_id: The id of the object.
+        :param date: A date or None.
+        :param value: A Decimal.
+
+        """
+        self.bulk_upsert([self.model(
+            type=type, object_id=object_id, date=date, value=value)])
+
+    def bulk_upsert(self, values):
+        """
+        Creates or updates many values keyed on their type, object and date.
+
+        On databases, that support it, dated values are written with native
+        ``INSERT ... ON CONFLICT`` or ``INSERT ... ON DUPLICATE KEY UPDATE``
+        statements. Elsewhere and for undated values, whose NULL dates are not
+        covered by the unique constraint, the rows of their types are locked
+        with ``SELECT ... FOR UPDATE``, so that concurrent upserts of the same
+        types wait for each other. Then the existing values are updated and
+        the others are created. SQLite ignores ``FOR UPDATE``, so this
+        fallback is not safe against concurrent writers there.
+
+        If several instances have the same type, object and date, the last
+        one wins. The primary keys of the instances are not set, since the
+        native upserts cannot return them without another query. Fetch the
+        values again, if you need them.
+
+        :param values: A list of unsaved DatedValue instances.
+
+        """
+        values = list(values)
+        if not values:
+            return
+        with transaction.commit_on_success(using=self.db):
+            self._upsert(values)
+        values_changed.send(sender=self.model, values=values)
+
+    def _upsert(self, values):
+        opts = self.model._meta
+        for instance in values:
+            instance._ctype_id = instance.type.ctype_id
+            instance.date = opts.get_field('date').to_python(instance.date)
+            instance.value = opts.get_field('value').to_python(instance.value)
+        # a statement cannot affect the same row twice, so the last one wins
+        values = OrderedDict(
+            ((value.type_id, value.object_id, value.date), value)
+            for value in values).values()
+        connection = connections[self.db]
+        cursor = connection.cursor()
+        sql = get_upsert_sql(connection, opts.db_table)
+        if sql is None:
+            self._locked_upsert(values)
+            return
+        self._locked_upsert([value for value in values if value.date is None])
+        dated = [value for value in values if value.date is not None]
+        modified = opts.get_field('modified').get_db_prep_save(
+            now(), connection)
+        for i in range(0, len(dated), UPSERT_BATCH_SIZE):
+            batch = dated[i:i + UPSERT_BATCH_SIZE]
+            params = []
+            for value in batch:
+                params.extend([
+                    value.type_id, value._ctype_id, value.object_id,
+                    opts.get_field('date').get_db_prep_save(
+                        value.date, connection),
+                    opts.get_field('value').get_db_prep_save(
+                        value.value, connection),
+                    modified,
+                ])
+            cursor.execute(sql.format(
+                values=', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(batch))),
+                params)
+        if dated:
+            transaction.set_dirty(using=self.db)
+
+    def _locked_upsert(self, values):
+        if not values:
+            return
+        keys = OrderedDict(
+            ((value.type_id, value.object_id, value.date), value)
+            for value in values)
+        # new values have no row, that could be locked, so concurrent upserts
+        # are serialized on the rows of their types instead
+        list(DatedValueType.objects.select_for_update().filter(
+            pk__in=set(key[0] for key in keys.keys())).order_by(
+            'pk').values_list('pk', flat=True))
+        dates = set(key[2] for key in keys.keys())
+        date_filter = Q(date__in=[date for date in dates if date])
+        if None in dates:
+            date_filter |= Q(date__isnull=True)
+        existing = self.select_for_update().filter(
+            date_filter,
+            type__in=set(key[0] for key in keys.keys()),
+            object_id__in=set(key[1] for key in keys.keys()),
+        )
+        pks_by_value = {}
+        for instance in existing:
+            value = keys.pop(
+                (instance.type_id, instance.object_id, instance.date), None)
+            if value is not None:
+                pks_by_value.setdefault(value.value, []).append(instance.pk)
+        for value, pks in pks_by_value.items():
+            self.filter(pk__in=pks).update(value=value, modified=now())
+        self.bulk_create(keys.values())
+
+
 class DatedValue(models.Model):
     """
     The value, that is attached to an object for a given date.
@@ -93,6 +668,7 @@ class DatedValue(models.Model):
     :object_id: The id of the object, that this value is for.
     :type: The DatedValueType this value belongs to.
     :value: The decimal value, that is attached.
+    :modified: When the value was last written. The bulk paths set it, too.
 
     """
     _ctype = models.ForeignKey(
@@ -125,6 +701,13 @@ class DatedValue(models.Model):
         decimal_places=8,
     )
 
+    modified = models.DateTimeField(
+        verbose_name=_('Modified'),
+        auto_now=True,
+    )
+
+    objects = DatedValueManager()
+
     def __unicode__(self):
         return '[{0}] {1} ({2}): {3}'.format(
             self.date, self.object, self.type, self.normal_value)
@@ -145,19 +728,147 @@ class DatedValue(models.Model):
 
         """
         if self.value:
-            return getattr(self, 'value').quantize(Decimal(
-                '0' * 24 + '.' + '0' * self.type.decimal_places))
+            return normalize_value(self.value, self.type.decimal_places)
 
     @normal_value.setter
     def normal_value(self, value):
         setattr(self, 'value', value)
 
+    def delete(self, *args, **kwargs):
+        super(DatedValue, self).delete(*args, **kwargs)
+        values_changed.send(sender=self.__class__, values=[self])
+
     def save(self, *args, **kwargs):
-        self._ctype = self.type.ctype
+        self._ctype_id = self.type.ctype_id
         super(DatedValue, self).save(*args, **kwargs)
+        values_changed.send(sender=self.__class__, values=[self])
 
     class Meta:
         ordering = ['date', ]
+        # the unique index also covers the window lookups of the forms. The
+        # ctype follows from the type, so it does not need to be indexed.
+        unique_together = [('type', 'object_id', 'date'), ]
+
+
+def get_translations(valuetypes, language_codes=None):
+    """
+    Returns the translations of the given DatedValueTypes.
+
+    All translations are fetched with one query and returned as a dictionary
+    of the form ``{valuetype_id: {language_code: translation}}``.
+
+    :param valuetypes: A list of DatedValueTypes.
+    :param language_codes: An optional list of language codes. If omitted,
+      all translations are returned.
+
+    """
+    translations = dict((valuetype.pk, {}) for valuetype in valuetypes)
+    if not translations:
+        return translations
+    qs = DatedValueType._meta.translations_model.objects.filter(
+        master__in=translations.keys())
+    if language_codes is not None:
+        qs = qs.filter(language_code__in=language_codes)
+    for translation in qs:
+        translations[translation.master_id][
+            translation.language_code] = translation
+    return translations
+
+
+def set_translation(valuetype, translations, language_code=None):
+    """
+    Sets the translation for the language on the DatedValueType.
+
+    Like the ``BetterTranslatedAttribute`` it falls back to the english
+    translation, if there is none for the requested language.
+
+    :param translations: A dictionary of the translations of the type keyed
+      by their language code.
+    :param language_code: The language code. Defaults to the current
+      language.
+
+    """
+    translation = translations.get(
+        language_code or get_language(), translations.get('en'))
+    if translation is not None:
+        setattr(valuetype, valuetype._meta.translations_cache, translation)
+
+
+def fill_translations(valuetypes, language_code=None):
+    """
+    Loads the translations of all DatedValueTypes with a single query.
+
+    Afterwards, accessing translated attributes like ``name`` does not query
+    the database anymore.
+
+    :param valuetypes: A list of DatedValueTypes.
+    :param language_code: The language code. Defaults to the current
+      language.
+
+    """
+    language_code = language_code or get_language()
+    translations = get_translations(valuetypes, [language_code, 'en'])
+    for valuetype in valuetypes:
+        set_translation(valuetype, translations[valuetype.pk], language_code)
+    return valuetypes
+
+
+class DatedValueTypeQuerySet(TranslationsQuerySetMixin, QuerySet):
+    """Custom queryset for the ``DatedValueType`` model."""
+
+    def get_translated_valuetypes(self, chunk):
+        return chunk
+
+    def with_translations(self, language_code=None):
+        """
+        Loads the translations together with the types.
+
+        The translations for the language and the english fallback are
+        fetched with one additional query (per 100 types), so that the
+        translated attributes are available without further queries.
+
+        :param language_code: The language code. Defaults to the current
+          language.
+
+        """
+        return self._clone(
+            translations_language=language_code or get_language())
+
+
+class DatedValueTypeManager(TranslationManager):
+    """Custom manager for the ``DatedValueType`` model."""
+
+    def get_query_set(self):
+        return DatedValueTypeQuerySet(self.model, using=self._db)
+
+    def with_translations(self, language_code=None):
+        return self.get_query_set().with_translations(language_code)
+
+    def for_ctype(self, ctype):
+        """
+        Returns a list of all DatedValueTypes for the given content type.
+
+        The types are ordered by their id. They and all their translations
+        are cached in the current process until a type or a translation is
+        saved or deleted. Every call returns new copies of the types with the
+        translation for the current language (or the english fallback)
+        already set.
+
+        """
+        def load():
+            valuetypes = list(self.filter(ctype=ctype).order_by('pk'))
+            translations = get_translations(valuetypes)
+            return [(valuetype, translations[valuetype.pk])
+                    for valuetype in valuetypes]
+
+        result = []
+        for valuetype, translations in get_or_set(
+                'valuetypes_{0}'.format(ctype.pk), VALUETYPES_VERSION_KEY,
+                load):
+            valuetype = copy(valuetype)
+            set_translation(valuetype, translations)
+            result.append(valuetype)
+        return result
 
 
 class DatedValueType(BetterTranslatedAttributeMixin, TranslatableModel):
@@ -211,6 +922,8 @@ class DatedValueType(BetterTranslatedAttributeMixin, TranslatableModel):
         default=False,
     )
 
+    objects = DatedValueTypeManager()
+
     def __unicode__(self):
         return '{0} ({1})'.format(
             self.safe_translation_getter('name', self.slug), self.ctype)
@@ -219,3 +932,188 @@ class DatedValueType(BetterTranslatedAttributeMixin, TranslatableModel):
         if self.decimal_places > 8:
             raise ValidationError(_(
                 'decimal_places cannot be bigger than 8.'))
+
+
+def invalidate_valuetypes(sender, **kwargs):
+    """Invalidates the cached DatedValueTypes, when a type has changed."""
+    bump_version(VALUETYPES_VERSION_KEY)
+
+
+for sender in (DatedValueType, DatedValueType._meta.translations_model):
+    post_save.connect(invalidate_valuetypes, sender=sender)
+    post_delete.connect(invalidate_valuetypes, sender=sender)
+
+
+# the maximum amount of objects, whose rollups are refreshed with one query
+ROLLUP_CHUNK_SIZE = 500
+
+
+class DatedValueRollupManager(models.Manager):
+    """Custom manager for the ``DatedValueRollup`` model."""
+
+    def refresh(self, values):
+        """
+        Recomputes the rollups of all months touched by the given values.
+
+        The series are grouped by their type. For every type and chunk of
+        ``ROLLUP_CHUNK_SIZE`` objects the raw values of the months between
+        the first and the last touched month are aggregated with one query,
+        the outdated rollups are deleted and the new ones are inserted in
+        bulk. All of that happens in one transaction or, if there is one
+        already, in the transaction of the caller.
+
+        :param values: A list of DatedValue instances.
+
+        """
+        months = {}
+        for value in values:
+            if value.date is None:
+                continue
+            key = (value.type_id, value._ctype_id, value.object_id)
+            months.setdefault(key, set()).add(
+                get_period_start(value.date, 'month'))
+        if not months:
+            return
+        # one filter per series would exceed the limits of the databases for
+        # large batches, so the objects of a type share the range of months
+        types = {}
+        for (type_id, ctype_id, object_id), periods in months.items():
+            group = types.setdefault((type_id, ctype_id), {
+                'objects': [], 'periods': set()})
+            group['objects'].append(object_id)
+            group['periods'].update(periods)
+
+        def refresh():
+            for (type_id, ctype_id), group in types.items():
+                start = min(group['periods'])
+                end = max(group['periods']) + relativedelta(months=1, days=-1)
+                object_ids = sorted(group['objects'])
+                for i in range(0, len(object_ids), ROLLUP_CHUNK_SIZE):
+                    chunk = object_ids[i:i + ROLLUP_CHUNK_SIZE]
+                    rows = DatedValue.objects.filter(
+                        type=type_id, _ctype=ctype_id, object_id__in=chunk,
+                    ).by_period('month', start=start, end=end)
+                    self.filter(
+                        type=type_id, _ctype=ctype_id, object_id__in=chunk,
+                        period__gte=start, period__lte=end).delete()
+                    self.bulk_create(
+                        self._get_rollups(rows, {type_id: ctype_id}))
+
+        self._run_in_transaction(refresh)
+
+    def rebuild(self):
+        """Deletes all rollups and creates them again from the raw values."""
+        def rebuild():
+            self.all().delete()
+            for type_id, ctype_id in DatedValueType.objects.values_list(
+                    'pk', 'ctype'):
+                rows = DatedValue.objects.filter(
+                    type=type_id).by_period('month')
+                self.bulk_create(self._get_rollups(rows, {type_id: ctype_id}))
+
+        self._run_in_transaction(rebuild)
+
+    def _run_in_transaction(self, func):
+        # a nested commit_on_success would commit the outer transaction early
+        if transaction.is_managed(using=self.db):
+            func()
+        else:
+            with transaction.commit_on_success(using=self.db):
+                func()
+
+    def _get_rollups(self, rows, ctypes):
+        return [self.model(
+            type_id=row['type'], _ctype_id=ctypes[row['type']],
+            object_id=row['object_id'], period=row['period'], sum=row['sum'],
+            count=row['count'], min=row['min'], max=row['max'],
+        ) for row in rows]
+
+
+class DatedValueRollup(models.Model):
+    """
+    The pre-aggregated DatedValues of an object and type for one month.
+
+    Rollups are only maintained if ``DATED_VALUES_ROLLUPS`` is True.
+
+    :_ctype: The ctype of the type.
+    :count: The amount of values in this month.
+    :max: The highest value in this month.
+    :min: The lowest value in this month.
+    :object_id: The id of the object, that the values are for.
+    :period: The first day of the month.
+    :sum: The sum of all values in this month.
+    :type: The DatedValueType of the values.
+
+    """
+    _ctype = models.ForeignKey(
+        ContentType,
+        verbose_name=_('Content Type'),
+    )
+
+    count = models.PositiveIntegerField(
+        verbose_name=_('Count'),
+    )
+
+    max = models.DecimalField(
+        verbose_name=_('Maximum'),
+        max_digits=24,
+        decimal_places=8,
+    )
+
+    min = models.DecimalField(
+        verbose_name=_('Minimum'),
+        max_digits=24,
+        decimal_places=8,
+    )
+
+    object_id = models.PositiveIntegerField(
+        verbose_name=_('Object id'),
+    )
+
+    period = models.DateField(
+        verbose_name=_('Period'),
+    )
+
+    sum = models.DecimalField(
+        verbose_name=_('Sum'),
+        max_digits=32,
+        decimal_places=8,
+    )
+
+    type = models.ForeignKey(
+        'dated_values.DatedValueType',
+        verbose_name=_('Type'),
+    )
+
+    objects = DatedValueRollupManager()
+
+    def __unicode__(self):
+        return '[{0}] {1} {2}: {3}'.format(
+            self.period, self.type_id, self.object_id, self.sum)
+
+    class Meta:
+        ordering = ['period', ]
+        index_together = [('type', '_ctype', 'object_id', 'period'), ]
+        unique_together = [('type', 'object_id', 'period'), ]
+
+
+def update_rollups(sender, values, **kwargs):
+    """Keeps the rollups up to date, when values have changed."""
+    if settings.ROLLUPS:
+        DatedValueRollup.objects.refresh(values)
+
+
+values_changed.connect(update_rollups, sender=DatedValue)
+
+
+def invalidate_values(sender, values, **kwargs):
+    """Bumps the versions of the objects, whose values have changed."""
+    objects = set()
+    for value in values:
+        ctype_id = value._ctype_id or value.type.ctype_id
+        objects.add((ctype_id, value.object_id))
+    for ctype_id, object_id in objects:
+        bump_version(get_values_version_key(ctype_id, object_id))
+
+
+values_changed.connect(invalidate_values, sender=DatedValue)
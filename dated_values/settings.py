@@ -5,3 +5,20 @@ ACCESS_ALLOWED = getattr(settings, 'DATED_VALUES_ACCESS_ALLOWED',
                          lambda user, obj=None: user.is_staff)
 DISPLAYED_ITEMS = getattr(settings, 'DATED_VALUES_DISPLAYED_ITEMS', 14)
 DATE_FORMAT = getattr(settings, 'DATED_VALUES_DATE_FORMAT', '%d-%m-%Y')
+CACHE_BACKEND = getattr(settings, 'DATED_VALUES_CACHE_BACKEND', None)
+LOCAL_CACHE_TIMEOUT = getattr(
+    settings, 'DATED_VALUES_LOCAL_CACHE_TIMEOUT', 300)
+ROLLUPS = getattr(settings, 'DATED_VALUES_ROLLUPS', False)
+ADJACENT_VIEWPORTS = getattr(
+    settings, 'DATED_VALUES_ADJACENT_VIEWPORTS', True)
+GRID_CACHE = getattr(settings, 'DATED_VALUES_GRID_CACHE', False)
+GRID_CACHE_TIMEOUT = getattr(
+    settings, 'DATED_VALUES_GRID_CACHE_TIMEOUT', 60 * 60 * 24)
+OBJECT_FIELDS = getattr(settings, 'DATED_VALUES_OBJECT_FIELDS', {})
+PERMISSION_CACHE_TIMEOUT = getattr(
+    settings, 'DATED_VALUES_PERMISSION_CACHE_TIMEOUT', None)
+METRICS_CALLBACK = getattr(settings, 'DATED_VALUES_METRICS_CALLBACK', None)
+DISPLAYED_PERIODS = getattr(settings, 'DATED_VALUES_DISPLAYED_PERIODS', {
+    'week': 13,
+    'month': 12,
+})
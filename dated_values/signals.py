@@ -0,0 +1,14 @@
+"""Signals of the dated_values app."""
+from django.dispatch import Signal
+
+
+# Sent whenever DatedValues were created, changed or deleted, be it by saving
+# or deleting a single instance, by deleting a queryset or by one of the bulk
+# write paths. The bulk write paths send it after their transaction was
+# committed. ``values`` is a list of the affected DatedValue instances.
+values_changed = Signal(providing_args=['values'])
+
+# Sent after a request to the ValuesManagementView with the view class as
+# sender. ``metrics`` is a dictionary of the counters of the request
+# (see ``dated_values.metrics``).
+view_measured = Signal(providing_args=['request', 'metrics'])
@@ -0,0 +1,103 @@
+/*
+ * Loads the previous and the next viewport of the values grid on demand.
+ *
+ * With DATED_VALUES_ADJACENT_VIEWPORTS set to False the grid does not render
+ * the hidden inputs of the adjacent viewports. This script fetches them from
+ * the dated_values_viewport_view, when the grid is used for the first time,
+ * and adds the same hidden inputs, that the server would have rendered:
+ *
+ *     <input type="hidden" class="value-before x{day} y{row}" value="...">
+ *     <input type="hidden" class="value-after x{day} y{row}" value="...">
+ *
+ * Afterwards the table fires the ``dated-values:viewports-loaded`` event.
+ * Call ``datedValues.loadAdjacentViewports(table, callback)`` to load them
+ * right away.
+ */
+var datedValues = (function() {
+    'use strict';
+
+    function getJSON(url, callback) {
+        var request = new XMLHttpRequest();
+        request.open('GET', url, true);
+        request.setRequestHeader('Accept', 'application/json');
+        request.onreadystatechange = function() {
+            if (request.readyState === 4 && request.status === 200) {
+                callback(JSON.parse(request.responseText));
+            }
+        };
+        request.send();
+    }
+
+    function addInputs(table, viewport, cls) {
+        var container = table.parentNode;
+        var rows = table.querySelectorAll('tr[data-slug]');
+        for (var i = 0; i < rows.length; i++) {
+            var values = viewport.values[rows[i].getAttribute('data-slug')] || {};
+            for (var x = 0; x < viewport.dates.length; x++) {
+                var input = document.createElement('input');
+                input.type = 'hidden';
+                input.className = cls + ' x' + x + ' y' + rows[i].getAttribute('data-index');
+                input.value = values[viewport.dates[x]] || '';
+                container.appendChild(input);
+            }
+        }
+    }
+
+    function fireLoaded(table) {
+        var event = document.createEvent('Event');
+        event.initEvent('dated-values:viewports-loaded', true, true);
+        table.dispatchEvent(event);
+    }
+
+    function loadAdjacentViewports(table, callback) {
+        if (table.datedValuesLoading) {
+            return;
+        }
+        table.datedValuesLoading = true;
+        var url = table.getAttribute('data-viewport-url');
+        var pending = 2;
+        var done = function() {
+            pending -= 1;
+            if (pending === 0) {
+                fireLoaded(table);
+                if (callback) {
+                    callback(table);
+                }
+            }
+        };
+        getJSON(url + '?date=' + encodeURIComponent(
+            table.getAttribute('data-previous-date')), function(viewport) {
+                addInputs(table, viewport, 'value-before');
+                done();
+            });
+        getJSON(url + '?date=' + encodeURIComponent(
+            table.getAttribute('data-next-date')), function(viewport) {
+                addInputs(table, viewport, 'value-after');
+                done();
+            });
+    }
+
+    function init() {
+        var tables = document.querySelectorAll(
+            'table.dated-values-table[data-viewport-url]');
+        for (var i = 0; i < tables.length; i++) {
+            (function(table) {
+                var load = function() {
+                    table.removeEventListener('focusin', load);
+                    table.removeEventListener('mouseover', load);
+                    loadAdjacentViewports(table);
+                };
+                table.addEventListener('focusin', load);
+                table.addEventListener('mouseover', load);
+            })(tables[i]);
+        }
+    }
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', init);
+    } else {
+        init();
+    }
+
+    return {loadAdjacentViewports: loadAdjacentViewports};
+})();
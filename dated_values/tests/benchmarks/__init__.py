@@ -0,0 +1,183 @@
+"""
+Benchmarks for the management grid and the hot paths of the models.
+
+The benchmarks build a synthetic dataset of one value per type, object and
+day with the factories of the test suite and measure the wall clock time and
+the amount of queries of each case. They run against the configured default
+database. Use ``run`` to get the results as a dictionary and ``write_results``
+to store them as JSON, so that runs can be compared.
+
+"""
+import json
+import platform
+from datetime import date, timedelta
+from decimal import Decimal
+from timeit import default_timer
+
+import django
+from django.contrib.contenttypes.models import ContentType
+from django.core.urlresolvers import reverse
+from django.db import connection, reset_queries
+from django.test.client import Client
+from django.utils.timezone import now
+
+from django_libs.tests.factories import UserFactory
+
+from ... import settings
+from ...forms import MultiTypeValuesFormset, ValuesForm
+from ...models import DatedValue, DatedValueType
+from ..factories import DatedValueFactory, DatedValueTypeFactory
+
+
+BATCH_SIZE = 500
+
+
+def build_dataset(types, objects, years, start=None):
+    """
+    Creates the types, the objects and one value per type, object and day.
+
+    Returns a tuple of the list of types and the list of objects.
+
+    :param types: The amount of DatedValueTypes.
+    :param objects: The amount of objects (users).
+    :param years: The amount of years of daily values per type and object.
+    :param start: The first date. Defaults to ``years`` years ago.
+
+    """
+    days = 365 * years
+    if start is None:
+        start = now().date() - timedelta(days=days)
+    valuetypes = [DatedValueTypeFactory() for i in range(0, types)]
+    users = [UserFactory() for i in range(0, objects)]
+    batch = []
+    for valuetype in valuetypes:
+        for user in users:
+            for i in range(0, days):
+                value = DatedValueFactory.build(
+                    type=valuetype, object=user,
+                    date=start + timedelta(days=i),
+                    value=Decimal(i % 100) / 4)
+                # bulk_create doesn't call save, which sets the content type
+                value._ctype_id = valuetype.ctype_id
+                batch.append(value)
+                if len(batch) >= BATCH_SIZE:
+                    DatedValue.objects.bulk_create(batch)
+                    batch = []
+    if batch:
+        DatedValue.objects.bulk_create(batch)
+    return valuetypes, users
+
+
+def measure(func, repeat=5):
+    """
+    Calls the function ``repeat`` times with the number of the run.
+
+    Returns a dictionary with the minimum and average time in seconds and the
+    amount of queries of a single call.
+
+    """
+    timings = []
+    use_debug_cursor = connection.use_debug_cursor
+    connection.use_debug_cursor = True
+    try:
+        for i in range(0, repeat):
+            # requests of the test client reset the queries, too
+            reset_queries()
+            started = default_timer()
+            func(i)
+            timings.append(default_timer() - started)
+            queries = len(connection.queries)
+    finally:
+        connection.use_debug_cursor = use_debug_cursor
+    return {
+        'min': min(timings),
+        'avg': sum(timings) / len(timings),
+        'queries': queries,
+        'repeat': repeat,
+    }
+
+
+def get_post_data(formset, changed_cells=1, value='1'):
+    """Returns the POST data of the formset with a few edited cells."""
+    data = {
+        'date': formset.date.strftime(settings.DATE_FORMAT),
+        'form-TOTAL_FORMS': len(formset.forms),
+        'form-INITIAL_FORMS': len(formset.forms),
+    }
+    for form in formset.forms:
+        for name, initial in form.initial.items():
+            data[form.add_prefix(name)] = initial
+    for form in formset.forms[:changed_cells]:
+        data[form.add_prefix('value0')] = value
+    return data
+
+
+def run(types=10, objects=10, years=1, repeat=5, changed_cells=1):
+    """
+    Builds the dataset and runs all benchmarks.
+
+    Returns a dictionary with the environment, the scale and a dictionary of
+    the results by benchmark name.
+
+    """
+    started = default_timer()
+    valuetypes, users = build_dataset(types, objects, years)
+    setup_time = default_timer() - started
+    obj = users[0]
+    ctype = ContentType.objects.get_for_model(obj)
+    day = now().date() - timedelta(days=180 * years)
+    results = {}
+
+    superuser = UserFactory(is_superuser=True)
+    client = Client()
+    client.login(username=superuser.username, password='test123')
+    url = reverse('dated_values_management_view', kwargs={
+        'ctype_id': ctype.pk, 'object_id': obj.pk}) + '?date={0}'.format(
+        day.strftime(settings.DATE_FORMAT))
+    results['view_get'] = measure(lambda i: client.get(url), repeat)
+
+    loaded_types = DatedValueType.objects.for_ctype(ctype)
+    formset = MultiTypeValuesFormset(obj, day, loaded_types)
+    # every run edits the cells again, so that each one writes
+    data = [get_post_data(formset, changed_cells, value)
+            for value in ('1', '2')]
+    results['view_post'] = measure(
+        lambda i: client.post(url, data[i % 2]), repeat)
+
+    results['formset_init'] = measure(
+        lambda i: MultiTypeValuesFormset(obj, day, loaded_types).forms,
+        repeat)
+    values = dict((value.date, value) for value in DatedValue.objects.filter(
+        type=valuetypes[0], object_id=obj.pk))
+    results['form_init'] = measure(
+        lambda i: ValuesForm(obj, day, valuetypes[0], values=values), repeat)
+
+    instances = list(DatedValue.objects.filter(object_id=obj.pk).select_related(
+        'type')[:1000])
+    result = measure(
+        lambda i: [instance.normal_value for instance in instances], repeat)
+    result['per_second'] = len(instances) / result['min'] if (
+        result['min']) else None
+    results['normal_value'] = result
+
+    return {
+        'date': date.today().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'scale': {
+            'types': types,
+            'objects': objects,
+            'years': years,
+            'values': DatedValue.objects.count(),
+            'displayed_items': settings.DISPLAYED_ITEMS,
+            'setup_time': setup_time,
+        },
+        'results': results,
+    }
+
+
+def write_results(results, path):
+    """Writes the results of ``run`` as JSON to the file at the path."""
+    with open(path, 'w') as fileobj:
+        json.dump(results, fileobj, indent=2, sort_keys=True)
@@ -0,0 +1,47 @@
+"""
+Runs the benchmarks of the dated_values app.
+
+By default they run at a tiny scale to keep them working. Set
+``DATED_VALUES_BENCHMARK`` to ``types,objects,years`` to run them at scale
+and ``DATED_VALUES_BENCHMARK_OUTPUT`` to a path to store the results as JSON.
+
+"""
+import json
+import os
+import tempfile
+
+from django.test import TestCase
+
+from .benchmarks import run, write_results
+
+
+class BenchmarksTestCase(TestCase):
+    """Tests for the benchmarks."""
+    longMessage = True
+
+    def get_scale(self):
+        scale = os.environ.get('DATED_VALUES_BENCHMARK')
+        if not scale:
+            return {'types': 2, 'objects': 2, 'years': 1, 'repeat': 1}
+        types, objects, years = [int(part) for part in scale.split(',')]
+        return {'types': types, 'objects': objects, 'years': years}
+
+    def test_benchmarks(self):
+        results = run(**self.get_scale())
+        self.assertEqual(
+            sorted(results['results'].keys()),
+            ['form_init', 'formset_init', 'normal_value', 'view_get',
+             'view_post'], msg=('All benchmarks should have been run.'))
+        self.assertEqual(results['results']['formset_init']['queries'], 1,
+                         msg=('The formset should load all values with one'
+                              ' query.'))
+        path = os.environ.get('DATED_VALUES_BENCHMARK_OUTPUT')
+        if not path:
+            fd, path = tempfile.mkstemp(suffix='.json')
+            os.close(fd)
+            self.addCleanup(os.remove, path)
+        write_results(results, path)
+        with open(path) as fileobj:
+            self.assertEqual(json.load(fileobj)['results'].keys(),
+                             results['results'].keys(), msg=(
+                                 'The results should be written as JSON.'))
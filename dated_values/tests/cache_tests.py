@@ -0,0 +1,88 @@
+"""Tests for the caching helpers of the dated_values app."""
+from time import time
+
+from django.test import TestCase
+
+from mock import Mock, patch
+
+from .. import cache
+
+
+class GetOrSetTestCase(TestCase):
+    """Tests for the ``get_or_set`` function."""
+    longMessage = True
+
+    def setUp(self):
+        cache.clear()
+
+    def test_function(self):
+        loader = Mock(return_value='foo')
+        self.assertEqual(cache.get_or_set('key', 'version', loader), 'foo')
+        self.assertEqual(cache.get_or_set('key', 'version', loader), 'foo')
+        self.assertEqual(loader.call_count, 1, msg=(
+            'The second call should have returned the cached value.'))
+
+        cache.bump_version('version')
+        cache.get_or_set('key', 'version', loader)
+        self.assertEqual(loader.call_count, 2, msg=(
+            'After bumping the version, the value should be loaded again.'))
+
+        cache.clear()
+        with patch.object(cache.settings, 'LOCAL_CACHE_TIMEOUT', -1):
+            cache.get_or_set('key', 'version', loader)
+            cache.get_or_set('key', 'version', loader)
+        self.assertEqual(loader.call_count, 4, msg=(
+            'Expired values should be loaded again.'))
+
+    def test_backend(self):
+        loader = Mock(return_value='foo')
+        with patch.object(cache.settings, 'CACHE_BACKEND', 'default'):
+            version = cache.get_version('version')
+            cache.get_or_set('key', 'version', loader)
+            cache.bump_version('version')
+            self.assertNotEqual(cache.get_version('version'), version, msg=(
+                'The version in the backend should have been increased.'))
+            cache.get_or_set('key', 'version', loader)
+        self.assertEqual(loader.call_count, 2, msg=(
+            'After bumping the version, the value should be loaded again.'))
+
+    def test_version_timeout(self):
+        with patch.object(cache.settings, 'CACHE_BACKEND', 'default'):
+            version = cache.get_version('version')
+            later = time() + 600
+            # the default timeout of the backend is 300 seconds
+            with patch('django.core.cache.backends.locmem.time') as clock:
+                clock.time.return_value = later
+                self.assertEqual(cache.get_version('version'), version, msg=(
+                    'The version should outlive the default timeout of the'
+                    ' backend.'))
+            cache.bump_version('version')
+            version = cache.get_version('version')
+            with patch('django.core.cache.backends.locmem.time') as clock:
+                clock.time.return_value = later
+                self.assertEqual(cache.get_version('version'), version, msg=(
+                    'A bumped version should outlive the default timeout of'
+                    ' the backend as well.'))
+
+
+class GetOrSetSharedTestCase(TestCase):
+    """Tests for the ``get_or_set_shared`` function."""
+    longMessage = True
+
+    def test_function(self):
+        loader = Mock(return_value='foo')
+        cache.get_or_set_shared('key', ['one', 'two'], loader, 60)
+        cache.get_or_set_shared('key', ['one', 'two'], loader, 60)
+        self.assertEqual(loader.call_count, 2, msg=(
+            'Without a shared backend nothing should be cached.'))
+
+        with patch.object(cache.settings, 'CACHE_BACKEND', 'default'):
+            cache.get_or_set_shared('key', ['one', 'two'], loader, 60)
+            self.assertEqual(cache.get_or_set_shared(
+                'key', ['one', 'two'], loader, 60), 'foo')
+            self.assertEqual(loader.call_count, 3, msg=(
+                'The second call should have returned the cached value.'))
+            cache.bump_version('two')
+            cache.get_or_set_shared('key', ['one', 'two'], loader, 60)
+        self.assertEqual(loader.call_count, 4, msg=(
+            'Bumping any of the versions should invalidate the value.'))
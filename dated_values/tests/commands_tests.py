@@ -0,0 +1,70 @@
+"""Tests for the management commands of the dated_values app."""
+import os
+from decimal import Decimal
+from StringIO import StringIO
+from tempfile import mkstemp
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from ..models import DatedValue, DatedValueRollup
+from .factories import DatedValueFactory
+
+
+class RebuildDatedValueRollupsTestCase(TestCase):
+    """Tests for the ``rebuild_dated_value_rollups`` command."""
+    longMessage = True
+
+    def setUp(self):
+        DatedValueFactory()
+
+    def test_command(self):
+        call_command('rebuild_dated_value_rollups', verbosity=0)
+        self.assertEqual(DatedValueRollup.objects.count(), 1, msg=(
+            'The command should have created the rollups.'))
+
+
+class ExportDatedValuesTestCase(TestCase):
+    """Tests for the ``export_dated_values`` command."""
+    longMessage = True
+
+    def setUp(self):
+        self.value = DatedValueFactory()
+        DatedValueFactory()
+
+    def test_command(self):
+        out = StringIO()
+        call_command('export_dated_values', stdout=out,
+                     objects=str(self.value.object_id))
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 2, msg=(
+            'The command should write a header and the matching value.'))
+        self.assertEqual(lines[1], '{0},{1},{2},{3}'.format(
+            self.value.type.slug, self.value.object_id,
+            self.value.date.date().isoformat(), self.value.value))
+
+
+class ImportDatedValuesTestCase(TestCase):
+    """Tests for the ``import_dated_values`` command."""
+    longMessage = True
+
+    def setUp(self):
+        self.value = DatedValueFactory(value=Decimal('1.5'))
+        out = StringIO()
+        call_command('export_dated_values', stdout=out)
+        self.value.delete()
+        fd, self.filename = mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w') as fileobj:
+            fileobj.write(out.getvalue())
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def test_command(self):
+        call_command('import_dated_values', self.filename, verbosity=0)
+        self.assertEqual(DatedValue.objects.count(), 1, msg=(
+            'The command should import the exported values.'))
+        self.assertRaises(CommandError, call_command, 'import_dated_values',
+                          verbosity=0)
+        self.assertRaises(CommandError, call_command, 'import_dated_values',
+                          self.filename, format='xml', verbosity=0)
@@ -0,0 +1,21 @@
+"""Tests for the export of the dated_values app."""
+from django.test import TestCase
+
+from ..export import get_export_queryset, iter_values
+from .factories import DatedValueFactory
+
+
+class IterValuesTestCase(TestCase):
+    """Tests for the ``iter_values`` function."""
+    longMessage = True
+
+    def setUp(self):
+        self.values = [DatedValueFactory() for i in range(0, 3)]
+
+    def test_function(self):
+        with self.assertNumQueries(3):
+            rows = list(iter_values(get_export_queryset(), chunk_size=2))
+        self.assertEqual(
+            [row[1] for row in rows],
+            [value.object_id for value in self.values],
+            msg='Should yield all values chunk by chunk.')
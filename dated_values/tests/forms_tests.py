@@ -1,12 +1,19 @@
 """Tests for the forms of the dated_values app."""
+from datetime import date
+from decimal import Decimal
+
+from django.db import connection
 from django.test import TestCase
 from django.utils.timezone import now
 
+from dateutil.relativedelta import relativedelta
 from django_libs.tests.factories import UserFactory
+from mock import patch
 
-from ..forms import ValuesForm, MultiTypeValuesFormset
-from ..models import DatedValue
-from .factories import DatedValueTypeFactory
+from ..forms import MultiTypeValuesFormset, PeriodValuesTable, ValuesForm
+from ..models import DatedValue, get_upsert_sql
+from .. import settings as app_settings
+from .factories import DatedValueFactory, DatedValueTypeFactory
 
 
 class ValuesFormTestCase(TestCase):
@@ -67,6 +74,33 @@ class ValuesFormTestCase(TestCase):
             'After calling save, there are not the correct amount of dated'
             ' values in the database.'))
 
+    def test_queries(self):
+        form = ValuesForm(self.user, now(), self.type, data=self.data)
+        form.save()
+        with self.assertNumQueries(1):
+            form = ValuesForm(self.user, now(), self.type)
+        self.assertEqual(len(form.instances), 14, msg=(
+            'The form should hold one instance for every displayed day.'))
+        self.assertTrue(all([instance.pk for instance in form.instances]),
+                        msg=('All values of the window should be loaded with'
+                             ' a single query.'))
+
+        form = ValuesForm(self.user, now(), self.type, data=self.data)
+        self.assertFalse(form.has_changed(), msg=(
+            'Submitting the stored values should not count as a change.'))
+        with self.assertNumQueries(0):
+            form.save()
+
+    def test_adjacent_viewports(self):
+        form = ValuesForm(self.user, now(), self.type)
+        self.assertEqual(len(form.values_before), 14, msg=(
+            'By default the form should render the previous viewport.'))
+        with patch.object(app_settings, 'ADJACENT_VIEWPORTS', False):
+            form = ValuesForm(self.user, now(), self.type)
+        self.assertEqual(form.values_before + form.values_after, [], msg=(
+            'When the adjacent viewports are disabled, the form should not'
+            ' render them.'))
+
 
 class MultiTypeValuesFormsetTestCase(TestCase):
     """Tests for the MultiTypeValuesFormset formset class."""
@@ -148,3 +182,98 @@ class MultiTypeValuesFormsetTestCase(TestCase):
         form = MultiTypeValuesFormset(self.user, now(), self.types,
                                       data=data)
         self.assertFalse(form.is_valid(), msg='The form should not be valid.')
+
+    def test_read_only_types(self):
+        read_only = DatedValueTypeFactory(editable=False)
+        hidden = DatedValueTypeFactory(hidden=True)
+        form = MultiTypeValuesFormset(self.user, now(), [self.type1])
+        for valuetype in [read_only, hidden]:
+            DatedValueFactory(type=valuetype, object=self.user,
+                              date=form.dates[0], value=Decimal('1'))
+        data = dict((key, value) for key, value in self.data.items()
+                    if not key.startswith('form-1-'))
+        data['form-TOTAL_FORMS'] = data['form-INITIAL_FORMS'] = u'3'
+        form = MultiTypeValuesFormset(
+            self.user, now(), [self.type1, read_only, hidden], data=data)
+        self.assertTrue(form.is_valid(), msg=(
+            'The form should be valid. Errors: {0}'.format(form.errors)))
+        form.save()
+        self.assertEqual(
+            DatedValue.objects.filter(type__in=[read_only, hidden]).count(), 2,
+            msg=('The values of read-only and hidden types, which have no'
+                 ' inputs in the grid, should not be deleted.'))
+        self.assertEqual(DatedValue.objects.filter(type=self.type1).count(),
+                         14, msg='The editable type should be saved.')
+
+    def test_queries(self):
+        form = MultiTypeValuesFormset(self.user, now(), self.types,
+                                      data=self.data)
+        self.assertTrue(form.is_valid())
+        native_upserts = get_upsert_sql(
+            connection, DatedValue._meta.db_table) is not None
+        with self.assertNumQueries(1 if native_upserts else 3):
+            form.save()
+        with self.assertNumQueries(0):
+            form = MultiTypeValuesFormset(self.user, now(), self.types)
+        with self.assertNumQueries(1):
+            valuesforms = form.forms
+        for valuesform in valuesforms:
+            self.assertTrue(
+                all([instance.pk for instance in valuesform.instances]),
+                msg=('The values of all types should be loaded with a single'
+                     ' query, when the forms are built.'))
+
+        data = self.data.copy()
+        data.update({'form-1-value4': '9'})
+        form = MultiTypeValuesFormset(self.user, now(), self.types,
+                                      data=data)
+        self.assertTrue(form.is_valid())
+        self.assertEqual(
+            [valuesform.has_changed() for valuesform in form.forms],
+            [False, True], msg=('Only forms with edited cells should count as'
+                                ' changed.'))
+        self.assertEqual(len(form.save()), 1, msg=(
+            'Only the cell with a different value should be saved.'))
+        self.assertEqual(DatedValue.objects.filter(value=9).count(), 1)
+
+
+class PeriodValuesTableTestCase(TestCase):
+    """Tests for the ``PeriodValuesTable`` class."""
+    longMessage = True
+
+    def setUp(self):
+        self.type = DatedValueTypeFactory(decimal_places=1)
+        self.hidden_type = DatedValueTypeFactory(hidden=True)
+        self.user = UserFactory()
+        for day, value in [(5, '1.5'), (20, '2'), (40, '4')]:
+            DatedValueFactory(
+                type=self.type, object=self.user, value=Decimal(value),
+                date=date(2014, 1, 1) + relativedelta(days=day))
+
+    def test_table(self):
+        with self.assertNumQueries(1):
+            table = PeriodValuesTable(self.user, date(2014, 1, 15),
+                                      [self.type, self.hidden_type], 'month')
+        self.assertEqual(table.date, date(2014, 1, 1), msg=(
+            'The table should start at the beginning of the month.'))
+        self.assertEqual(len(table.periods), 12)
+        self.assertEqual(table.next_viewport_start_date, date(2015, 1, 1))
+        self.assertEqual(len(table.rows), 1, msg=(
+            'Hidden types should be left out.'))
+        self.assertEqual(table.rows[0][1][:3],
+                         [Decimal('3.5'), Decimal('4.0'), None], msg=(
+                             'The values should be summed up per month.'))
+        self.assertEqual(table.fetched_rows, 2, msg=(
+            'The table should count the fetched rows of both months.'))
+
+        table = PeriodValuesTable(self.user, date(2014, 1, 15), [self.type],
+                                  'week', aggregate='count')
+        self.assertEqual(table.date, date(2014, 1, 13))
+        self.assertEqual(table.rows[0][1][:3], [None, 1, None], msg=(
+            'The values should be counted per week.'))
+
+        table = PeriodValuesTable(self.user, date(2014, 1, 15), [self.type],
+                                  'month', aggregate='avg')
+        self.assertEqual(table.rows[0][1][:3],
+                         [Decimal('1.8'), Decimal('4.0'), None], msg=(
+                             'The values should be averaged per month.'))
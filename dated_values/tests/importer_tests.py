@@ -0,0 +1,71 @@
+"""Tests for the import of the dated_values app."""
+from datetime import date
+from decimal import Decimal
+from StringIO import StringIO
+
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+
+from django_libs.tests.factories import UserFactory
+
+from ..importer import ValuesImporter, iter_rows
+from ..models import DatedValue
+from .factories import DatedValueFactory, DatedValueTypeFactory
+
+
+class IterRowsTestCase(TestCase):
+    """Tests for the ``iter_rows`` function."""
+    longMessage = True
+
+    def test_function(self):
+        csv_rows = list(iter_rows(StringIO(
+            'type,object_id,date,value\r\nfoo,1,2014-01-01,1.5\r\n')))
+        ndjson_rows = list(iter_rows(StringIO(
+            '{"type": "foo", "object_id": 1, "date": "2014-01-01",'
+            ' "value": "1.5"}\n\n'), 'ndjson'))
+        self.assertEqual(csv_rows[0]['value'], '1.5')
+        self.assertEqual(ndjson_rows[0]['value'], '1.5')
+        self.assertRaises(ValueError, iter_rows, StringIO(''), 'xml')
+
+
+class ValuesImporterTestCase(TestCase):
+    """Tests for the ``ValuesImporter`` class."""
+    longMessage = True
+
+    def setUp(self):
+        self.type = DatedValueTypeFactory()
+        self.user = UserFactory()
+        self.value = DatedValueFactory(
+            type=self.type, object=self.user, date=date(2014, 1, 1),
+            value=Decimal('1'))
+
+    def get_row(self, day, value, slug=None):
+        return {'type': slug or self.type.slug, 'object_id': self.user.pk,
+                'date': day, 'value': value}
+
+    def test_run(self):
+        rows = [
+            self.get_row('2014-01-01', '2'),
+            self.get_row('2014-01-02', '3'),
+            self.get_row('', '4'),
+        ]
+        importer = ValuesImporter(batch_size=2)
+        self.assertEqual(importer.run(rows), 3)
+        self.assertEqual(
+            [(value.date, value.value) for value in DatedValue.objects.filter(
+                object_id=self.user.pk).order_by('value')],
+            [(date(2014, 1, 1), Decimal('2')), (date(2014, 1, 2), Decimal('3')),
+             (None, Decimal('4'))],
+            msg='Existing values should be updated, new ones created.')
+
+        ValuesImporter().run([self.get_row('', '5')])
+        self.assertEqual(
+            DatedValue.objects.get(object_id=self.user.pk, date=None).value,
+            Decimal('5'), msg='Undated values should be updated as well.')
+
+        self.assertRaises(ValidationError, ValuesImporter().run,
+                          [self.get_row('2014-01-01', '1.234')])
+        self.assertRaises(ValidationError, ValuesImporter().run,
+                          [self.get_row('2014-01-01', '1', 'foo')])
+        self.assertRaises(ValidationError, ValuesImporter().run,
+                          [self.get_row('01.01.2014', '1')])
@@ -0,0 +1,42 @@
+"""Test mixins of the dated_values app."""
+from contextlib import contextmanager
+
+from ..signals import view_measured
+
+
+class QueryBudgetMixin(object):
+    """
+    Mixin for TestCases to assert, that views stay within a query budget.
+
+    The budget is checked against the ``queries`` of the metrics, that the
+    views report via the ``view_measured`` signal. Set ``query_budget`` on
+    the TestCase or pass the budget to ``assertQueryBudget``.
+
+    """
+    query_budget = None
+
+    @contextmanager
+    def assertQueryBudget(self, budget=None):
+        """
+        Fails, if a view measured inside of the block exceeds the budget.
+
+        Yields the list of the reported metrics.
+
+        """
+        if budget is None:
+            budget = self.query_budget
+        reports = []
+
+        def receiver(sender, metrics, **kwargs):
+            reports.append(metrics)
+
+        view_measured.connect(receiver, weak=False)
+        try:
+            yield reports
+        finally:
+            view_measured.disconnect(receiver)
+        self.assertTrue(reports, msg='No view was measured inside the block.')
+        for metrics in reports:
+            self.assertLessEqual(metrics['queries'], budget, msg=(
+                'The {0} request to {1} exceeded its query budget.'.format(
+                    metrics['method'], metrics['view'])))
@@ -1,14 +1,239 @@
 """Tests for the models of the dated_values app."""
+from datetime import date, datetime, timedelta
 from decimal import Decimal
 
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection
 from django.test import TestCase
+from django.utils.translation import override
 
+from django_libs.tests.factories import UserFactory
+
+from mock import patch
+
+from .. import settings as app_settings
+from ..models import (
+    DatedValue,
+    DatedValueRollup,
+    DatedValueType,
+    get_upsert_sql,
+)
 from .factories import DatedValueFactory, DatedValueTypeFactory
 
 
+class DatedValueManagerTestCase(TestCase):
+    """Tests for the ``DatedValueManager`` manager class."""
+    longMessage = True
+
+    def setUp(self):
+        self.type = DatedValueTypeFactory()
+        self.user = UserFactory()
+        self.value = DatedValueFactory(type=self.type)
+        self.other_value = DatedValueFactory(type=self.type)
+        self.native_upserts = get_upsert_sql(
+            connection, DatedValue._meta.db_table) is not None
+
+    def test_upsert(self):
+        DatedValue.objects.upsert(
+            self.type, self.user.pk, date(2014, 1, 1), Decimal('1'))
+        DatedValue.objects.upsert(
+            self.type, self.user.pk, date(2014, 1, 1), Decimal('2'))
+        DatedValue.objects.upsert(self.type, self.user.pk, None, Decimal('3'))
+        DatedValue.objects.upsert(self.type, self.user.pk, None, Decimal('4'))
+        self.assertEqual(
+            [(value.date, value.value) for value in DatedValue.objects.filter(
+                object_id=self.user.pk).order_by('value')],
+            [(date(2014, 1, 1), Decimal('2')), (None, Decimal('4'))],
+            msg='Upserting the same key twice should update the value.')
+
+    def test_bulk_upsert(self):
+        values = [
+            DatedValue(type=self.type, object_id=self.user.pk,
+                       date=date(2014, 1, 1), value='1.5'),
+            DatedValue(type=self.type, object_id=self.value.object_id,
+                       date=self.value.date, value='2.5'),
+        ]
+        old = datetime(2000, 1, 1)
+        DatedValue.objects.update(modified=old)
+        # without native upserts, the types are locked, the existing values
+        # selected and updated and the new ones created
+        with self.assertNumQueries(1 if self.native_upserts else 4):
+            DatedValue.objects.bulk_upsert(values)
+        self.assertGreater(DatedValue.objects.get(pk=self.value.pk).modified,
+                           old, msg=('Upserts should set the modification'
+                                     ' stamp.'))
+        self.assertEqual(DatedValue.objects.count(), 3, msg=(
+            'One value should have been created and one updated.'))
+        self.assertEqual(
+            DatedValue.objects.get(pk=self.value.pk).value, Decimal('2.5'),
+            msg='The existing value should have been updated.')
+
+        DatedValue.objects.update(modified=old)
+        with patch('dated_values.models.get_upsert_sql', return_value=None):
+            values[0].value = '3.5'
+            DatedValue.objects.bulk_upsert(values)
+        self.assertGreater(
+            DatedValue.objects.get(object_id=self.user.pk).modified, old,
+            msg='The fallback should set the modification stamp.')
+        self.assertEqual(
+            DatedValue.objects.get(object_id=self.user.pk).value,
+            Decimal('3.5'), msg='The fallback should update the value.')
+        self.assertEqual(DatedValue.objects.count(), 3, msg=(
+            'The fallback should not create duplicates.'))
+
+        DatedValue.objects.bulk_upsert([
+            DatedValue(type=self.type, object_id=self.user.pk,
+                       date=date(2014, 1, 1), value=value)
+            for value in ('4.5', '5.5')])
+        self.assertEqual(
+            DatedValue.objects.get(object_id=self.user.pk).value,
+            Decimal('5.5'), msg=('Of several values with the same key, the'
+                                 ' last one should win.'))
+
+    def test_as_of(self):
+        user = UserFactory()
+        undated = DatedValueFactory(
+            type=self.type, object=user, date=None, value=Decimal('1'))
+        first = DatedValueFactory(
+            type=self.type, object=user, date=date(2014, 1, 10),
+            value=Decimal('2'))
+        second = DatedValueFactory(
+            type=self.type, object=user, date=date(2014, 1, 20),
+            value=Decimal('3'))
+        self.assertEqual(
+            DatedValue.objects.value_as_of(user, self.type, date(2014, 1, 1)),
+            undated, msg=(
+                'Before the first dated value, the undated value applies.'))
+        self.assertEqual(
+            DatedValue.objects.value_as_of(user, self.type, date(2014, 1, 10)),
+            first, msg='The value of the day itself should apply.')
+        self.assertEqual(
+            DatedValue.objects.value_as_of(user, self.type, date(2014, 1, 19)),
+            first, msg='The last known value should apply.')
+        self.assertEqual(
+            DatedValue.objects.value_as_of(user, self.type, date(2015, 1, 1)),
+            second, msg='The last known value should apply.')
+        self.assertIsNone(
+            DatedValue.objects.value_as_of(
+                self.user, self.type, date(2014, 1, 1)),
+            msg='Objects without values should return None.')
+
+        with self.assertNumQueries(1):
+            values = DatedValue.objects.values_as_of(
+                [user.pk, self.value.object_id, self.user.pk], self.type,
+                date(2100, 1, 1))
+        self.assertEqual(
+            values, {user.pk: second, self.value.object_id: self.value},
+            msg='Should return the applying values of all objects.')
+
+    def test_get_values_as_of(self):
+        other_type = DatedValueTypeFactory(decimal_places=0)
+        DatedValueFactory(type=self.type, object=self.user,
+                          date=date(2014, 1, 1), value=Decimal('1.234'))
+        DatedValueFactory(type=other_type, object=self.user, date=None,
+                          value=Decimal('2'))
+        expected = {self.user.pk: {
+            self.type.slug: Decimal('1.23'), other_type.slug: Decimal('2')}}
+        with self.assertNumQueries(1):
+            values = DatedValue.objects.get_values_as_of(
+                User.objects.filter(pk=self.user.pk),
+                [self.type.slug, other_type.slug], date(2014, 2, 1))
+        self.assertEqual(values, expected, msg=(
+            'Should return the normalized values per object and slug.'))
+        self.assertEqual(
+            DatedValue.objects.get_values_as_of(
+                [self.user.pk], [self.type.slug, other_type.slug],
+                date(2014, 2, 1)),
+            expected, msg='Should also accept a list of object ids.')
+
+    def test_annotate_values_as_of(self):
+        DatedValueFactory(type=self.type, object=self.user,
+                          date=date(2014, 1, 1), value=Decimal('1.5'))
+        with self.assertNumQueries(1):
+            user = DatedValue.objects.annotate_values_as_of(
+                User.objects.filter(pk=self.user.pk), [self.type.slug],
+                date(2014, 2, 1))[0]
+            self.assertEqual(
+                Decimal(str(getattr(user, self.type.slug.replace('-', '_')))),
+                Decimal('1.5'), msg='The value should have been selected.')
+
+    def test_with_related(self):
+        DatedValueFactory(type=DatedValueTypeFactory())
+        ContentType.objects.get_for_id(self.type.ctype_id)
+        with self.assertNumQueries(3):
+            for value in DatedValue.objects.with_related():
+                unicode(value)
+                value.normal_value
+
+    def test_by_period(self):
+        user = UserFactory()
+        for day, value in ((1, '1'), (2, '2'), (31, '4'), (32, '8')):
+            DatedValueFactory(
+                type=self.type, object=user,
+                date=date(2014, 1, 1) + timedelta(days=day - 1),
+                value=Decimal(value))
+        qs = DatedValue.objects.filter(object_id=user.pk)
+        with self.assertNumQueries(1):
+            rows = qs.by_period('month')
+        self.assertEqual(
+            [(row['period'], row['sum'], row['min'], row['max'], row['count'])
+             for row in rows],
+            [(date(2014, 1, 1), Decimal('7'), Decimal('1'), Decimal('4'), 3),
+             (date(2014, 2, 1), Decimal('8'), Decimal('8'), Decimal('8'), 1)],
+            msg='Should aggregate the values per month.')
+        self.assertEqual(rows[0]['object_id'], user.pk)
+        self.assertEqual(rows[0]['type'], self.type.pk)
+
+        rows = qs.by_period('week')
+        self.assertEqual(
+            [(row['period'], row['sum']) for row in rows],
+            [(date(2013, 12, 30), Decimal('3')),
+             (date(2014, 1, 27), Decimal('12'))],
+            msg='Weeks should start on mondays.')
+
+        rows = qs.by_period('year', end=date(2014, 1, 31))
+        self.assertEqual(
+            [(row['period'], row['sum']) for row in rows],
+            [(date(2014, 1, 1), Decimal('7'))],
+            msg='Values after the end should be ignored.')
+
+        rows = qs.by_period('day', start=date(2014, 1, 2),
+                            end=date(2014, 1, 4), fill_gaps=True)
+        self.assertEqual(
+            [(row['period'], row['sum'], row['count']) for row in rows],
+            [(date(2014, 1, 2), Decimal('2'), 1),
+             (date(2014, 1, 3), None, 0),
+             (date(2014, 1, 4), None, 0)],
+            msg='Missing days should be added, when filling gaps.')
+
+    def test_bulk_write(self):
+        new_value = DatedValue(type=self.type, object_id=self.user.pk,
+                               date=date(2014, 1, 1), value=Decimal('1.5'))
+        self.value.value = Decimal('2.5')
+        old = datetime(2000, 1, 1)
+        DatedValue.objects.update(modified=old)
+        with self.assertNumQueries(3 if self.native_upserts else 5):
+            DatedValue.objects.bulk_write(
+                to_create=[new_value], to_update=[self.value],
+                to_delete=[self.other_value])
+        self.assertEqual(DatedValue.objects.count(), 2, msg=(
+            'One value should have been created and one deleted.'))
+        self.assertEqual(
+            DatedValue.objects.get(pk=self.value.pk).value, Decimal('2.5'),
+            msg='The updated value should have been written.')
+        self.assertGreater(
+            DatedValue.objects.get(pk=self.value.pk).modified, old,
+            msg='Updates should set the modification stamp.')
+        self.assertEqual(
+            DatedValue.objects.get(object_id=self.user.pk)._ctype,
+            self.type.ctype, msg=(
+                'The content type should be set on bulk created values.'))
+        self.assertIsNone(self.other_value.pk, msg=(
+            'Deleted instances should not have a primary key anymore.'))
+
+
 class DatedValueTestCase(TestCase):
     """Tests for the ``DatedValue`` model class."""
     longMessage = True
@@ -31,6 +256,11 @@ class DatedValueTestCase(TestCase):
     def test_clean(self):
         self.assertRaises(ValidationError, self.datedvalue.clean)
 
+    def test_unique(self):
+        self.assertRaises(
+            IntegrityError, DatedValueFactory, type=self.datedvalue.type,
+            object=self.datedvalue.object, date=self.datedvalue.date)
+
 
 class DatedValueTypeTestCase(TestCase):
     """Tests for the ``DatedValueType`` model class."""
@@ -46,3 +276,108 @@ class DatedValueTypeTestCase(TestCase):
     def test_clean(self):
         self.datedvaluetype.decimal_places = 9
         self.assertRaises(ValidationError, self.datedvaluetype.clean)
+
+
+class DatedValueTypeManagerTestCase(TestCase):
+    """Tests for the ``DatedValueTypeManager`` manager class."""
+    longMessage = True
+
+    def setUp(self):
+        self.type1 = DatedValueTypeFactory()
+        self.type2 = DatedValueTypeFactory()
+
+    def test_for_ctype(self):
+        ctype = self.type1.ctype
+        self.assertEqual(
+            DatedValueType.objects.for_ctype(ctype), [self.type1, self.type2],
+            msg='Should return all types of the content type.')
+        with self.assertNumQueries(0):
+            valuetypes = DatedValueType.objects.for_ctype(ctype)
+            self.assertEqual(valuetypes[0].name, self.type1.name, msg=(
+                'The types and their names should be cached.'))
+
+        self.type2.delete()
+        self.assertEqual(
+            DatedValueType.objects.for_ctype(ctype), [self.type1], msg=(
+                'Deleting a type should invalidate the cached types.'))
+
+    def test_with_translations(self):
+        with self.assertNumQueries(2):
+            names = [valuetype.name for valuetype in
+                     DatedValueType.objects.with_translations()]
+        self.assertEqual(names, [self.type1.name, self.type2.name], msg=(
+            'Should return the types with their translations.'))
+
+        self.type1.translate('en')
+        self.type1.name = 'english'
+        self.type1.save()
+        with override('de'), self.assertNumQueries(2):
+            valuetype = DatedValueType.objects.filter(
+                pk=self.type1.pk).with_translations()[0]
+            self.assertEqual(valuetype.name, 'english', msg=(
+                'Should fall back to the english translation.'))
+
+
+class DatedValueRollupManagerTestCase(TestCase):
+    """Tests for the ``DatedValueRollupManager`` manager class."""
+    longMessage = True
+
+    def setUp(self):
+        self.type = DatedValueTypeFactory()
+        self.user = UserFactory()
+        self.value = DatedValueFactory(
+            type=self.type, object=self.user, date=date(2014, 1, 1),
+            value=Decimal('1'))
+
+    def get_rollups(self):
+        return [(rollup.period, rollup.sum, rollup.count)
+                for rollup in DatedValueRollup.objects.all()]
+
+    def test_refresh(self):
+        self.assertEqual(DatedValueRollup.objects.count(), 0, msg=(
+            'Without DATED_VALUES_ROLLUPS, no rollups should be created.'))
+        with patch.object(app_settings, 'ROLLUPS', True):
+            DatedValueFactory(type=self.type, object=self.user,
+                              date=date(2014, 1, 2), value=Decimal('2'))
+            self.assertEqual(
+                self.get_rollups(), [(date(2014, 1, 1), Decimal('3'), 2)],
+                msg='Saving a value should update the rollup of its month.')
+
+            self.value.value = Decimal('5')
+            new_value = DatedValue(type=self.type, object_id=self.user.pk,
+                                   date=date(2014, 2, 1), value=Decimal('4'))
+            DatedValue.objects.bulk_write(
+                to_create=[new_value], to_update=[self.value])
+            self.assertEqual(
+                self.get_rollups(),
+                [(date(2014, 1, 1), Decimal('7'), 2),
+                 (date(2014, 2, 1), Decimal('4'), 1)],
+                msg='Bulk writes should update the rollups as well.')
+
+            DatedValue.objects.get(date=date(2014, 2, 1)).delete()
+            self.assertEqual(
+                self.get_rollups(), [(date(2014, 1, 1), Decimal('7'), 2)],
+                msg='Deleting the last value should delete the rollup.')
+
+            DatedValue.objects.filter(date=date(2014, 1, 2)).delete()
+            self.assertEqual(
+                self.get_rollups(), [(date(2014, 1, 1), Decimal('5'), 1)],
+                msg='Deleting a queryset should update the rollups as well.')
+
+    def test_refresh_large_batch(self):
+        values = [DatedValue(type=self.type, object_id=object_id,
+                             date=date(2014, 1 + object_id % 3, 1),
+                             value=Decimal('1'))
+                  for object_id in range(1000, 2200)]
+        with patch.object(app_settings, 'ROLLUPS', True):
+            DatedValue.objects.bulk_upsert(values)
+        self.assertEqual(
+            DatedValueRollup.objects.filter(object_id__gte=1000).count(), 1200,
+            msg=('Should refresh the rollups of large batches, without'
+                 ' exceeding the limits of the database.'))
+
+    def test_rebuild(self):
+        DatedValueRollup.objects.rebuild()
+        self.assertEqual(
+            self.get_rollups(), [(date(2014, 1, 1), Decimal('1'), 1)],
+            msg='Should create the rollups from the raw values.')
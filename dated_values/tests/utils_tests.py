@@ -0,0 +1,69 @@
+"""Tests for the utilities of the dated_values app."""
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.test import TestCase
+
+from ..utils import (
+    get_period_start,
+    get_period_starts,
+    get_viewport_dates,
+    normalize_value,
+)
+
+
+class GetPeriodStartTestCase(TestCase):
+    """Tests for the ``get_period_start`` function."""
+    longMessage = True
+
+    def test_function(self):
+        day = date(2014, 3, 13)
+        self.assertEqual(get_period_start(day, 'day'), day)
+        self.assertEqual(get_period_start(day, 'week'), date(2014, 3, 10))
+        self.assertEqual(get_period_start(day, 'month'), date(2014, 3, 1))
+        self.assertEqual(get_period_start(day, 'year'), date(2014, 1, 1))
+        self.assertRaises(ValueError, get_period_start, day, 'decade')
+
+
+class GetPeriodStartsTestCase(TestCase):
+    """Tests for the ``get_period_starts`` function."""
+    longMessage = True
+
+    def test_function(self):
+        self.assertEqual(
+            get_period_starts(date(2014, 1, 31), date(2014, 3, 1), 'month'),
+            [date(2014, 1, 1), date(2014, 2, 1), date(2014, 3, 1)], msg=(
+                'Should return the first days of all touched months.'))
+
+
+class NormalizeValueTestCase(TestCase):
+    """Tests for the ``normalize_value`` function."""
+    longMessage = True
+
+    def test_function(self):
+        self.assertIsNone(normalize_value(None, 2), msg=(
+            'None should stay None.'))
+        self.assertEqual(
+            str(normalize_value(Decimal('123.12345678'), 2)), '123.12', msg=(
+                'The value should be quantized to the decimal places.'))
+        self.assertEqual(
+            str(normalize_value(Decimal('123.12345678'), 0)), '123', msg=(
+                'The value should be quantized to zero decimal places.'))
+        self.assertEqual(
+            str(normalize_value(Decimal('1.5'), 10)), '1.5000000000', msg=(
+                'Decimal places outside of the cached range should work.'))
+
+
+class GetViewportDatesTestCase(TestCase):
+    """Tests for the ``get_viewport_dates`` function."""
+    longMessage = True
+
+    def test_function(self):
+        dates = get_viewport_dates(date(2014, 3, 1), 7)
+        self.assertEqual(len(dates), 21, msg=(
+            'The dates of all three viewports should be returned.'))
+        self.assertEqual(dates[0], date(2014, 2, 22))
+        self.assertEqual(dates[7], date(2014, 3, 1))
+        self.assertEqual(dates[-1], date(2014, 3, 14))
+        self.assertIs(get_viewport_dates(datetime(2014, 3, 1, 12), 7), dates,
+                      msg=('The dates should be cached per date.'))
@@ -1,22 +1,32 @@
 """Tests for the views of the dated_values app."""
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
 from django.utils.timezone import now
 
 from django_libs.tests.mixins import ViewTestMixin
 from django_libs.tests.factories import UserFactory
 from dateutil.relativedelta import relativedelta
+from mock import Mock, patch
 
-from .factories import DatedValueTypeFactory
-from ..models import DatedValue
+from .factories import DatedValueFactory, DatedValueTypeFactory
+from .mixins import QueryBudgetMixin
+from ..models import DatedValue, get_upsert_sql
 from .. import settings as app_settings
 
 
-class ValuesManagementViewTestCase(ViewTestMixin, TestCase):
+class ValuesManagementViewTestCase(QueryBudgetMixin, ViewTestMixin,
+                                   TestCase):
     """Tests for the ``ValuesManagementView`` view class."""
     longMessage = True
+    query_budget = 6
 
     def get_view_kwargs(self):
         return {'ctype_id': self.ctype.id, 'object_id': self.user.id}
@@ -53,6 +63,23 @@ class ValuesManagementViewTestCase(ViewTestMixin, TestCase):
             and_redirects_to=self.get_login_url() + '?next=/4/1/')
         self.should_be_callable_when_authenticated(self.staff)
         self.should_be_callable_when_authenticated(self.superuser)
+        with patch.object(app_settings, 'ADJACENT_VIEWPORTS', False):
+            resp = self.is_callable(user=self.staff)
+        self.assertIn('data-viewport-url="/4/1/viewport/"', resp.content,
+                      msg=('Without the adjacent viewports, the template'
+                           ' should point the client to the viewport view.'))
+        self.assertIn('dated_values/js/dated_values.js', resp.content, msg=(
+            'The script, that loads the adjacent viewports, should be'
+            ' included.'))
+        self.assertIn('data-slug="{0}"'.format(self.type1.slug), resp.content)
+        resp = self.is_callable(data={'resolution': 'month'})
+        self.assertEqual(len(resp.context['table'].periods), 12, msg=(
+            'With a monthly resolution, the view should show the aggregates'
+            ' per month.'))
+        self.is_not_callable(data={'resolution': 'decade'}, message=(
+            'Unknown resolutions should not be callable.'))
+        self.is_not_callable(data={'date': '2014-01-01'}, message=(
+            'Dates in another format should not be callable.'))
 
         self.is_not_callable(
             kwargs={'ctype_id': self.ctype.id, 'object_id': 9001},
@@ -82,3 +109,242 @@ class ValuesManagementViewTestCase(ViewTestMixin, TestCase):
         self.is_not_callable(message=(
             'When there are no value types in the database, the view should'
             ' not be callable.'))
+
+    def test_aggregates(self):
+        DatedValueFactory(type=self.type1, object=self.user,
+                          date=now().date(), value=Decimal('1.5'))
+        resp = self.is_callable(
+            user=self.staff, data={'resolution': 'month', 'aggregate': 'avg'})
+        self.assertEqual(resp.context['table'].rows[0][1][0], Decimal('1.50'),
+                         msg='The view should show the averages per month.')
+
+    def test_metrics(self):
+        callback = Mock()
+        with patch.object(app_settings, 'METRICS_CALLBACK', callback):
+            self.is_callable(user=self.staff)
+        metrics = callback.call_args[0][1]
+        self.assertEqual(metrics['forms'], 2, msg=(
+            'The callback should receive the counters of the request.'))
+        self.assertEqual(metrics['cells_saved'], 0)
+        self.assertTrue(metrics['queries'])
+
+        native_upserts = get_upsert_sql(
+            connection, DatedValue._meta.db_table) is not None
+        with self.assertQueryBudget(6 if native_upserts else 8) as reports:
+            self.is_callable(method='post', data=self.data)
+        self.assertEqual(reports[0]['cells_saved'], 28, msg=(
+            'The saved cells should be counted.'))
+        with self.assertQueryBudget():
+            self.is_callable()
+
+    def test_grid_cache(self):
+        self.login(self.staff)
+        with patch.multiple(app_settings, GRID_CACHE=True,
+                            CACHE_BACKEND='default'):
+            self.is_callable()
+            callback = Mock()
+            with patch.object(app_settings, 'METRICS_CALLBACK', callback):
+                resp = self.is_callable()
+            self.assertEqual(callback.call_args[0][1]['forms'], 0, msg=(
+                'When the grid is cached, the formset should not be built.'))
+            self.assertIn('dated-values-table', resp.content)
+
+            DatedValueFactory(type=self.type1, object=self.user,
+                              date=now().date(), value=Decimal('42.5'))
+            resp = self.is_callable()
+        self.assertIn('42.5', resp.content, msg=(
+            'Saving a value of the object should invalidate the grid.'))
+
+    def test_conditional_get(self):
+        self.login(self.staff)
+        resp = self.is_callable()
+        etag = resp['ETag']
+        self.assertTrue(resp.has_header('ETag'))
+        resp = self.client.get(self.get_url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304, msg=(
+            'When the client has a current copy, the view should return 304.'))
+        self.assertEqual(resp['ETag'], etag, msg=(
+            'The 304 should repeat the ETag.'))
+        self.assertIn('no-cache', resp['Cache-Control'], msg=(
+            'The 304 should keep the caching headers of the full response.'))
+
+        value = DatedValueFactory(type=self.type1, object=self.user,
+                                  date=now().date())
+        resp = self.client.get(self.get_url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200, msg=(
+            'A new value should change the ETag.'))
+        etag = resp['ETag']
+        value.delete()
+        resp = self.client.get(self.get_url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200, msg=(
+            'A deleted value should change the ETag.'))
+        self.assertFalse(resp.has_header('Last-Modified'), msg=(
+            'Only the ETag should be used for validation.'))
+
+        value = DatedValueFactory(type=self.type1, object=self.user,
+                                  date=now().date(), value=Decimal('1'))
+        etag = self.client.get(self.get_url())['ETag']
+        DatedValue.objects.filter(pk=value.pk).update(
+            value=Decimal('2'), modified=value.modified)
+        resp = self.client.get(self.get_url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200, msg=(
+            'Changes, that keep the modification stamp and the count, should'
+            ' change the ETag.'))
+
+    def test_object_resolution(self):
+        self.login(self.staff)
+        with patch.object(app_settings, 'OBJECT_FIELDS',
+                          {'auth.user': ['username']}):
+            resp = self.is_callable()
+        self.assertTrue(resp.context['view'].object._deferred, msg=(
+            'Only the configured fields of the object should be loaded.'))
+
+        self.addCleanup(cache.clear)
+        access_allowed = Mock(return_value=True)
+        with patch.multiple(app_settings, PERMISSION_CACHE_TIMEOUT=60,
+                            ACCESS_ALLOWED=access_allowed):
+            self.is_callable()
+            self.is_callable()
+        self.assertEqual(access_allowed.call_count, 1, msg=(
+            'The permission decision should be cached.'))
+
+
+class ValuesViewportViewTestCase(ViewTestMixin, TestCase):
+    """Tests for the ``ValuesViewportView`` view class."""
+    longMessage = True
+
+    def get_view_kwargs(self):
+        return {'ctype_id': self.ctype.id, 'object_id': self.user.id}
+
+    def get_login_url(self):
+        return settings.LOGIN_URL
+
+    def get_view_name(self):
+        return 'dated_values_viewport_view'
+
+    def setUp(self):
+        self.type1 = DatedValueTypeFactory(decimal_places=2)
+        self.type2 = DatedValueTypeFactory(editable=False)
+        self.user = UserFactory()
+        self.staff = UserFactory(is_staff=True)
+        self.ctype = ContentType.objects.get_for_model(User)
+        self.start = date(2014, 1, 1)
+        self.value = DatedValueFactory(
+            type=self.type1, object=self.user, date=self.start,
+            value=Decimal('1.5'))
+        self.data_payload = {
+            'date': self.start.strftime(app_settings.DATE_FORMAT)}
+
+    def patch(self, data):
+        return self.client.generic(
+            'PATCH', self.get_url() + '?date={0}'.format(self.data_payload['date']),
+            data=json.dumps(data), content_type='application/json')
+
+    def test_view(self):
+        self.should_redirect_to_login_when_anonymous()
+        resp = self.is_callable(user=self.staff, data=self.data_payload)
+        data = json.loads(resp.content)
+        self.assertEqual(data['start'], '2014-01-01')
+        self.assertEqual(len(data['dates']), app_settings.DISPLAYED_ITEMS,
+                         msg=('The viewport should contain all dates.'))
+        self.assertEqual(data['values'][self.type1.slug],
+                         {'2014-01-01': '1.50'}, msg=(
+                             'The view should return the values of the'
+                             ' viewport.'))
+        self.assertEqual(data['values'][self.type2.slug], {})
+        resp = self.client.get(self.get_url(), data={'date': '01/01/2014'})
+        self.assertEqual(resp.status_code, 400, msg=(
+            'Dates in another format should be rejected.'))
+        self.assertEqual(json.loads(resp.content),
+                         {'errors': {'date': 'Invalid date.'}})
+
+        day = (self.start + timedelta(days=1)).isoformat()
+        resp = self.patch({'values': {self.type1.slug: {
+            '2014-01-01': None, day: '2.5'}}})
+        self.assertEqual(resp.status_code, 200, msg=(
+            'Valid changes should be saved.'))
+        self.assertEqual(json.loads(resp.content)['values'][self.type1.slug],
+                         {'2014-01-01': None, day: '2.50'})
+        self.assertEqual(DatedValue.objects.get().value, Decimal('2.5'), msg=(
+            'The emptied cell should be deleted and the new one created.'))
+
+        for data in [
+                'foo',
+                {'values': {self.type2.slug: {day: '1'}}},
+                {'values': {self.type1.slug: {'foo': '1'}}},
+                {'values': {self.type1.slug: {day: '1.234'}}}]:
+            resp = self.patch(data)
+            self.assertEqual(resp.status_code, 400, msg=(
+                'Invalid payloads, read-only types, invalid dates and values'
+                ' should be rejected.'))
+        self.assertEqual(DatedValue.objects.get().value, Decimal('2.5'), msg=(
+            'Rejected changes should not be saved.'))
+
+
+class DatedValuesExportViewTestCase(ViewTestMixin, TestCase):
+    """Tests for the ``DatedValuesExportView`` view class."""
+    longMessage = True
+
+    def get_login_url(self):
+        return settings.LOGIN_URL
+
+    def get_view_name(self):
+        return 'dated_values_export_view'
+
+    def setUp(self):
+        self.value = DatedValueFactory()
+        self.other_value = DatedValueFactory()
+        self.staff = UserFactory(is_staff=True)
+        self.superuser = UserFactory(is_superuser=True)
+
+    def test_view(self):
+        self.should_redirect_to_login_when_anonymous()
+        self.is_callable(
+            user=self.staff,
+            and_redirects_to=self.get_login_url() + '?next=/export/')
+        resp = self.is_callable(user=self.superuser)
+        lines = ''.join(resp.streaming_content).splitlines()
+        self.assertEqual(len(lines), 3, msg=(
+            'The export should contain a header and one line per value.'))
+        self.assertEqual(lines[0], 'type,object_id,date,value')
+
+        resp = self.is_callable(data={
+            'format': 'ndjson', 'types': self.value.type.slug,
+            'ctype_id': self.value._ctype_id})
+        lines = ''.join(resp.streaming_content).splitlines()
+        self.assertEqual(len(lines), 1, msg=(
+            'Only the values of the requested type should be exported.'))
+        self.assertIn('"object_id": {0}'.format(self.value.object_id),
+                      lines[0])
+
+        self.is_not_callable(data={'format': 'xml'}, message=(
+            'Unknown formats should not be callable.'))
+        self.is_not_callable(data={'start': 'foo'}, message=(
+            'Invalid dates should not be callable.'))
+
+    def test_object_permissions(self):
+        owner = self.value.object
+        data = {'ctype_id': self.value._ctype_id,
+                'objects': str(self.value.object_id)}
+        access_allowed = lambda user, obj: obj.pk == user.pk
+        with patch.object(app_settings, 'ACCESS_ALLOWED', access_allowed):
+            self.login(owner)
+            resp = self.is_callable(data=data)
+            lines = ''.join(resp.streaming_content).splitlines()
+            self.assertEqual(len(lines), 2, msg=(
+                'Users should be able to export the values of the objects,'
+                ' that they can access.'))
+
+            self.login(self.other_value.object)
+            resp = self.client.get(self.get_url(), data=data)
+            self.assertEqual(resp.status_code, 302, msg=(
+                'Users should not be able to export the values of objects,'
+                ' that they cannot access.'))
+            self.assertIn(settings.LOGIN_URL, resp['Location'])
+            resp = self.client.get(self.get_url(), data={
+                'ctype_id': self.value._ctype_id})
+            self.assertEqual(resp.status_code, 302, msg=(
+                'Users without superuser status have to name the objects.'))
+            self.is_not_callable(
+                data={'ctype_id': self.value._ctype_id, 'objects': '9001'},
+                message='Objects, that do not exist, should not be callable.')
@@ -1,11 +1,19 @@
 """URLs for the dated_values app."""
 from django.conf.urls.defaults import patterns, url
 
-from .views import ValuesManagementView
+from .views import (
+    DatedValuesExportView,
+    ValuesManagementView,
+    ValuesViewportView,
+)
 
 
 urlpatterns = patterns(
     '',
     url(r'^(?P<ctype_id>\d+)/(?P<object_id>\d+)/$',
         ValuesManagementView.as_view(), name='dated_values_management_view'),
+    url(r'^(?P<ctype_id>\d+)/(?P<object_id>\d+)/viewport/$',
+        ValuesViewportView.as_view(), name='dated_values_viewport_view'),
+    url(r'^export/$', DatedValuesExportView.as_view(),
+        name='dated_values_export_view'),
 )
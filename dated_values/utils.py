@@ -0,0 +1,110 @@
+"""Utilities for the dated_values app."""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+
+
+def get_quantizer(decimal_places):
+    """Returns a Decimal to quantize values to ``decimal_places``."""
+    return Decimal('0' * 24 + '.' + '0' * decimal_places)
+
+
+# ``DatedValueType.decimal_places`` can only range from 0 to 8, so we create
+# the quantizers for all of them once
+QUANTIZERS = dict((decimal_places, get_quantizer(decimal_places))
+                  for decimal_places in range(0, 9))
+
+
+def normalize_value(value, decimal_places):
+    """
+    Returns the value quantized to the given amount of decimal places.
+
+    :param value: A Decimal or None.
+    :param decimal_places: The ``decimal_places`` of the DatedValueType.
+
+    """
+    if value is None:
+        return None
+    quantizer = QUANTIZERS.get(decimal_places)
+    if quantizer is None:
+        quantizer = get_quantizer(decimal_places)
+    return value.quantize(quantizer)
+
+
+PERIODS = ('day', 'week', 'month', 'year')
+
+
+def get_period_start(date, period):
+    """
+    Returns the first day of the period, that contains the date.
+
+    Weeks start on mondays.
+
+    :param date: A date.
+    :param period: One of ``day``, ``week``, ``month`` or ``year``.
+
+    """
+    if period == 'day':
+        return date
+    if period == 'week':
+        return date - timedelta(days=date.weekday())
+    if period == 'month':
+        return date.replace(day=1)
+    if period == 'year':
+        return date.replace(month=1, day=1)
+    raise ValueError('Unknown period: {0}'.format(period))
+
+
+def get_period_starts(start, end, period):
+    """
+    Returns the first days of all periods between two dates.
+
+    :param start: The first date. It is part of the first period.
+    :param end: The last date. It is part of the last period.
+    :param period: One of ``day``, ``week``, ``month`` or ``year``.
+
+    """
+    step = {
+        'day': relativedelta(days=1),
+        'week': relativedelta(weeks=1),
+        'month': relativedelta(months=1),
+        'year': relativedelta(years=1),
+    }[period]
+    current = get_period_start(start, period)
+    result = []
+    while current <= end:
+        result.append(current)
+        current += step
+    return result
+
+
+#: Viewport date ranges by start date and length. The ranges only depend on
+#: their arguments, so they can be shared by all requests.
+_VIEWPORT_DATES = {}
+VIEWPORT_DATES_MAX_ENTRIES = 256
+
+
+def get_viewport_dates(date, days):
+    """
+    Returns the dates of the previous, current and next viewport.
+
+    The result is a tuple of ``days * 3`` consecutive dates, that starts
+    ``days`` days before ``date``. It is cached and meant to be computed once
+    per request and handed to every form of the grid.
+
+    :param date: The first date of the current viewport.
+    :param days: The amount of days of a viewport.
+
+    """
+    if isinstance(date, datetime):
+        date = date.date()
+    key = (date, days)
+    dates = _VIEWPORT_DATES.get(key)
+    if dates is None:
+        if len(_VIEWPORT_DATES) >= VIEWPORT_DATES_MAX_ENTRIES:
+            _VIEWPORT_DATES.clear()
+        start = date - timedelta(days=days)
+        dates = tuple(start + timedelta(days=i) for i in range(0, days * 3))
+        _VIEWPORT_DATES[key] = dates
+    return dates
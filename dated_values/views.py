@@ -1,15 +1,45 @@
 """Views for the dated_values app."""
+import json
+from hashlib import md5
+
+from django import forms
 from django.contrib.contenttypes.models import ContentType
-from django.core.exceptions import ObjectDoesNotExist
+from django.core.cache import cache as default_cache
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.core.urlresolvers import reverse
-from django.http import Http404
+from django.db.models import Count, Max, Sum
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
+from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+from django.utils.safestring import mark_safe
 from django.utils.timezone import datetime, now
-from django.views.generic import FormView
+from django.utils.translation import get_language
+from django.views.generic import FormView, View
 
-from . import settings
+from . import metrics, settings
+from .cache import get_backend, get_or_set_shared, get_version
 from .decorators import permission_required
-from .forms import MultiTypeValuesFormset
-from .models import DatedValueType
+from .export import CONTENT_TYPES, FORMATS, get_export_queryset, iter_export
+from .forms import (
+    AGGREGATES,
+    RESOLUTIONS,
+    MultiTypeValuesFormset,
+    PeriodValuesTable,
+    get_window_values,
+)
+from .models import (
+    VALUETYPES_VERSION_KEY,
+    DatedValue,
+    DatedValueType,
+    get_values_version_key,
+)
+from .utils import get_viewport_dates, normalize_value
 
 
 def passes_test(user, obj):
@@ -25,40 +55,202 @@ def passes_test(user, obj):
     return access_allowed(user, obj)
 
 
-class ValuesManagementView(FormView):
-    template_name = 'dated_values/values_management_form.html'
-    form_class = MultiTypeValuesFormset
+def cached_passes_test(user, obj):
+    """
+    Like ``passes_test``, but caches the decision for authenticated users.
+
+    Decisions are cached for ``DATED_VALUES_PERMISSION_CACHE_TIMEOUT``
+    seconds in the ``DATED_VALUES_CACHE_BACKEND`` or the default cache. If
+    the timeout is not set, nothing is cached.
+
+    """
+    if not settings.PERMISSION_CACHE_TIMEOUT or user.pk is None:
+        return passes_test(user, obj)
+    backend = get_backend() or default_cache
+    key = 'dated_values_access_{0}_{1}_{2}'.format(
+        user.pk, obj._meta.db_table, obj.pk)
+    allowed = backend.get(key)
+    if allowed is None:
+        allowed = passes_test(user, obj)
+        backend.set(key, allowed, settings.PERMISSION_CACHE_TIMEOUT)
+    return allowed
+
+
+def get_object(ctype, object_id):
+    """
+    Returns the object of the content type with the given id.
+
+    Only the fields from ``DATED_VALUES_OBJECT_FIELDS`` are loaded, if any
+    are set for the model.
+
+    """
+    queryset = ctype.get_all_objects_for_this_type()
+    fields = settings.OBJECT_FIELDS.get(
+        '{0}.{1}'.format(ctype.app_label, ctype.model))
+    if fields:
+        queryset = queryset.only(*fields)
+    return queryset.get(pk=object_id)
+
+
+class ValuesManagementMixin(object):
+    """
+    Resolves the object and its value types and checks the permissions.
+
+    Sets ``ctype``, ``object``, ``valuetypes``, ``date_str`` and ``date`` on
+    the view. A ``date`` parameter, that does not match the
+    ``DATED_VALUES_DATE_FORMAT``, is answered by ``invalid_date``.
+
+    """
+    def invalid_date(self):
+        """Handles a malformed ``date`` parameter. Raises a 404 by default."""
+        raise Http404
 
     def dispatch(self, request, *args, **kwargs):
         try:
             self.ctype = ContentType.objects.get_for_id(
                 kwargs.get('ctype_id'))
-            self.object = self.ctype.get_all_objects_for_this_type().get(
-                pk=kwargs.get('object_id'))
+            self.object = get_object(self.ctype, kwargs.get('object_id'))
         except ObjectDoesNotExist:
             raise Http404
-        if passes_test(request.user, obj=self.object):
-            self.valuetypes = DatedValueType.objects.filter(ctype=self.ctype)
+        if cached_passes_test(request.user, obj=self.object):
+            self.valuetypes = DatedValueType.objects.for_ctype(self.ctype)
             if len(self.valuetypes) == 0:
                 raise Http404
             self.date_str = request.GET.get('date') or request.POST.get('date')
             if self.date_str:
                 date_fmt = getattr(settings, 'DATE_FORMAT')
-                self.date = datetime.strptime(self.date_str, date_fmt)
+                try:
+                    self.date = datetime.strptime(self.date_str, date_fmt)
+                except ValueError:
+                    return self.invalid_date()
             else:
                 self.date = now().date()
-            return super(ValuesManagementView, self).dispatch(
+            return super(ValuesManagementMixin, self).dispatch(
                 request, *args, **kwargs)
-        return permission_required(super(ValuesManagementView, self).dispatch,
+        return permission_required(super(ValuesManagementMixin, self).dispatch,
                                    test_to_pass=passes_test,
                                    obj=self.object)(
             request, *args, **kwargs)
 
+
+class ValuesManagementView(ValuesManagementMixin, FormView):
+    """
+    Grid to edit the values of an object day by day.
+
+    With the ``resolution`` parameter set to ``week`` or ``month`` it shows
+    the values aggregated per period instead (see ``PeriodValuesTable``). The
+    ``aggregate`` parameter selects the aggregate and defaults to ``sum``.
+
+    """
+    template_name = 'dated_values/values_management_form.html'
+    form_class = MultiTypeValuesFormset
+
+    def dispatch(self, request, *args, **kwargs):
+        dispatch = super(ValuesManagementView, self).dispatch
+        if metrics.is_enabled():
+            return metrics.measure(self, dispatch, request, *args, **kwargs)
+        return dispatch(request, *args, **kwargs)
+
+    def get(self, request, *args, **kwargs):
+        resolution = request.GET.get('resolution') or 'day'
+        aggregate = request.GET.get('aggregate') or 'sum'
+        if resolution not in RESOLUTIONS or aggregate not in AGGREGATES:
+            raise Http404
+        if resolution == 'day':
+            etag = self.get_etag()
+            if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+                response = HttpResponseNotModified()
+            elif settings.GRID_CACHE and settings.CACHE_BACKEND:
+                form = self.get_form(self.get_form_class())
+                ctx = self.get_context_data(form=form)
+                ctx['grid'] = self.get_grid(ctx)
+                response = self.render_to_response(ctx)
+            else:
+                response = super(ValuesManagementView, self).get(
+                    request, *args, **kwargs)
+            response['ETag'] = quote_etag(etag)
+            # the browser has to ask again, before it shows its copy
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        self.table = PeriodValuesTable(
+            self.object, self.date, self.valuetypes, resolution,
+            aggregate=aggregate)
+        return self.render_to_response(
+            self.get_context_data(table=self.table))
+
     def form_valid(self, form):
         if form.is_valid():
             form.save()
         return super(ValuesManagementView, self).form_valid(form)
 
+    def get_etag(self):
+        """
+        Returns the ETag of the day grid.
+
+        The ETag is computed from the versions of the values of the object
+        and of the value types, the latest ``modified`` stamp, the count and
+        the sum of the values in the window, the value types, the object, the
+        language and the CSRF token of the page.
+
+        The versions change on every write through the models, even within
+        the resolution of ``modified``. Without a shared cache backend they
+        are only known to the current process. Then the count and the sum
+        catch deletions and writes, that don't touch ``modified``, like
+        ``QuerySet.update()``.
+
+        There is no ``Last-Modified`` header, since the timestamps cannot
+        tell two writes within the same second apart.
+
+        """
+        dates = get_viewport_dates(self.date, settings.DISPLAYED_ITEMS)
+        if not settings.ADJACENT_VIEWPORTS:
+            dates = dates[settings.DISPLAYED_ITEMS:
+                          settings.DISPLAYED_ITEMS * 2]
+        stats = DatedValue.objects.filter(
+            type__in=[valuetype.pk for valuetype in self.valuetypes],
+            _ctype=self.ctype, object_id=self.object.pk,
+            date__gte=dates[0], date__lte=dates[-1],
+        ).aggregate(modified=Max('modified'), count=Count('pk'),
+                    sum=Sum('value'))
+        etag = md5(repr([
+            get_version(get_values_version_key(self.ctype.pk, self.object.pk)),
+            get_version(VALUETYPES_VERSION_KEY),
+            stats['modified'], stats['count'], stats['sum'], dates[0],
+            get_language(), self.object.pk,
+            self.request.META.get('CSRF_COOKIE'),
+            [(valuetype.pk, valuetype.name, valuetype.decimal_places,
+              valuetype.editable, valuetype.hidden)
+             for valuetype in self.valuetypes],
+        ])).hexdigest()
+        return etag
+
+    def get_grid(self, ctx):
+        """
+        Returns the rendered grid from the cache.
+
+        It is cached per object, date, and language and invalidated by any
+        change of the values of the object or of the value types.
+
+        """
+        date = self.date
+        if isinstance(date, datetime):
+            date = date.date()
+        key = 'grid_{0}_{1}_{2}_{3}'.format(
+            self.ctype.pk, self.object.pk, date.isoformat(), get_language())
+        version_keys = [
+            get_values_version_key(self.ctype.pk, self.object.pk),
+            VALUETYPES_VERSION_KEY,
+        ]
+        return mark_safe(get_or_set_shared(
+            key, version_keys,
+            lambda: render_to_string(
+                'dated_values/partials/values_grid.html', ctx),
+            settings.GRID_CACHE_TIMEOUT))
+
+    def get_form(self, form_class):
+        self.formset = super(ValuesManagementView, self).get_form(form_class)
+        return self.formset
+
     def get_form_kwargs(self):
         kwargs = super(ValuesManagementView, self).get_form_kwargs()
         kwargs.update({
@@ -68,6 +260,17 @@ class ValuesManagementView(FormView):
         })
         return kwargs
 
+    def get_context_data(self, **kwargs):
+        ctx = super(ValuesManagementView, self).get_context_data(**kwargs)
+        ctx.update({
+            # every lookup on the formset in a template would build its forms
+            'viewport': {'date': self.date},
+            'adjacent_viewports': settings.ADJACENT_VIEWPORTS,
+            'viewport_url': reverse(
+                'dated_values_viewport_view', kwargs=self.kwargs),
+        })
+        return ctx
+
     def get_success_url(self):
         if self.date_str:
             get_date = '?date={0}'.format(self.date_str)
@@ -75,3 +278,204 @@ class ValuesManagementView(FormView):
             get_date = ''
         return reverse(
             'dated_values_management_view', kwargs=self.kwargs) + get_date
+
+
+class ValuesViewportView(ValuesManagementMixin, View):
+    """
+    JSON API for a single viewport of the values of an object.
+
+    ``GET`` returns the viewport starting at the ``date`` parameter as
+    ``{"start": ..., "dates": [...], "values": {slug: {date: value}}}`` with
+    ISO formatted dates. Days without a value are left out.
+
+    ``PATCH`` accepts ``{"values": {slug: {date: value}}}`` with only the
+    changed cells. A value of ``null`` or ``""`` deletes the cell. It
+    responds with the saved cells in the same format or with status 400 and
+    ``{"errors": ...}``.
+
+    """
+    http_method_names = View.http_method_names + ['patch']
+
+    def get_start_date(self):
+        if isinstance(self.date, datetime):
+            return self.date.date()
+        return self.date
+
+    def render_to_json(self, data, status=200):
+        return HttpResponse(json.dumps(data), status=status,
+                            content_type='application/json')
+
+    def invalid_date(self):
+        return self.render_to_json({'errors': {'date': 'Invalid date.'}},
+                                   status=400)
+
+    def get(self, request, *args, **kwargs):
+        start = self.get_start_date()
+        days = settings.DISPLAYED_ITEMS
+        valuetypes = [valuetype for valuetype in self.valuetypes
+                      if not valuetype.hidden]
+        window = get_window_values(self.object, start, valuetypes,
+                                   adjacent=False)
+        values = {}
+        for valuetype in valuetypes:
+            values[valuetype.slug] = dict(
+                (date.isoformat(), str(normalize_value(
+                    value.value, valuetype.decimal_places)))
+                for date, value in window[valuetype.pk].items())
+        return self.render_to_json({
+            'start': start.isoformat(),
+            'dates': [date.isoformat() for date in get_viewport_dates(
+                start, days)[days:days * 2]],
+            'values': values,
+        })
+
+    def get_cells(self, data):
+        """
+        Validates the submitted cells.
+
+        Returns a tuple of a list of ``(valuetype, date, value)`` tuples and a
+        dictionary of errors.
+
+        """
+        valuetypes = dict((valuetype.slug, valuetype)
+                          for valuetype in self.valuetypes
+                          if valuetype.editable and not valuetype.hidden)
+        cells, errors = [], {}
+        for slug, dated_values in data.items():
+            valuetype = valuetypes.get(slug)
+            if valuetype is None or not isinstance(dated_values, dict):
+                errors[slug] = 'This type cannot be edited.'
+                continue
+            field = forms.DecimalField(
+                required=False, decimal_places=valuetype.decimal_places)
+            for day, value in dated_values.items():
+                try:
+                    date = datetime.strptime(day, '%Y-%m-%d').date()
+                    value = field.clean(value if value is not None else '')
+                except ValueError:
+                    errors.setdefault(slug, {})[day] = 'Invalid date.'
+                except ValidationError as ex:
+                    errors.setdefault(slug, {})[day] = ' '.join(ex.messages)
+                else:
+                    cells.append((valuetype, date, value))
+        return cells, errors
+
+    def patch(self, request, *args, **kwargs):
+        try:
+            data = json.loads(request.body)['values']
+            if not isinstance(data, dict):
+                raise TypeError
+        except (ValueError, KeyError, TypeError):
+            return self.render_to_json(
+                {'errors': 'Invalid JSON payload.'}, status=400)
+        cells, errors = self.get_cells(data)
+        if errors:
+            return self.render_to_json({'errors': errors}, status=400)
+        existing = dict(
+            ((value.type_id, value.date), value)
+            for value in DatedValue.objects.filter(
+                type__in=set(cell[0].pk for cell in cells),
+                date__in=set(cell[1] for cell in cells),
+                _ctype=self.ctype, object_id=self.object.pk))
+        to_create, to_update, to_delete = [], [], []
+        result = {}
+        for valuetype, date, value in cells:
+            instance = existing.get((valuetype.pk, date))
+            if value is None:
+                if instance is not None:
+                    to_delete.append(instance)
+            elif instance is None:
+                to_create.append(DatedValue(
+                    type=valuetype, object_id=self.object.pk, date=date,
+                    value=value))
+            elif instance.value != value:
+                instance.value = value
+                to_update.append(instance)
+            result.setdefault(valuetype.slug, {})[date.isoformat()] = (
+                None if value is None else str(normalize_value(
+                    value, valuetype.decimal_places)))
+        DatedValue.objects.bulk_write(to_create, to_update, to_delete)
+        return self.render_to_json({'values': result})
+
+
+class DatedValuesExportView(View):
+    """
+    Streams DatedValues as CSV or NDJSON.
+
+    Accepts the GET parameters ``format`` (``csv`` or ``ndjson``),
+    ``ctype_id``, ``types`` (comma separated slugs), ``objects`` (comma
+    separated ids), ``start`` and ``end``.
+
+    Superusers can export everything. All other users have to name the
+    content type and the objects and pass ``ACCESS_ALLOWED`` for every one of
+    them.
+
+    """
+    def dispatch(self, request, *args, **kwargs):
+        self.ctype, self.object_ids = self.get_objects_filter()
+        if self.has_access(request.user):
+            return super(DatedValuesExportView, self).dispatch(
+                request, *args, **kwargs)
+        return permission_required(
+            super(DatedValuesExportView, self).dispatch,
+            test_to_pass=lambda user, obj: False)(request, *args, **kwargs)
+
+    def get_objects_filter(self):
+        """Returns the content type and the object ids from the request."""
+        ctype = None
+        if self.request.GET.get('ctype_id'):
+            try:
+                ctype = ContentType.objects.get_for_id(
+                    self.request.GET.get('ctype_id'))
+            except (ObjectDoesNotExist, ValueError):
+                raise Http404
+        object_ids = self.get_list('objects')
+        if object_ids and not all(pk.isdigit() for pk in object_ids):
+            raise Http404
+        return ctype, object_ids
+
+    def has_access(self, user):
+        """
+        Returns True, if the user may export the requested values.
+
+        The objects are fetched with one query and checked one by one.
+
+        """
+        if user.is_superuser:
+            return True
+        if self.ctype is None or not self.object_ids:
+            return False
+        object_ids = set(int(pk) for pk in self.object_ids)
+        objects = list(self.ctype.get_all_objects_for_this_type(
+            pk__in=object_ids))
+        if len(objects) != len(object_ids):
+            raise Http404
+        return all(cached_passes_test(user, obj) for obj in objects)
+
+    def get_date(self, name):
+        value = self.request.GET.get(name)
+        if value:
+            try:
+                return datetime.strptime(
+                    value, getattr(settings, 'DATE_FORMAT')).date()
+            except ValueError:
+                raise Http404
+
+    def get_list(self, name):
+        value = self.request.GET.get(name)
+        if value:
+            return value.split(',')
+
+    def get(self, request, *args, **kwargs):
+        fmt = request.GET.get('format', 'csv')
+        if fmt not in FORMATS:
+            raise Http404
+        queryset = get_export_queryset(
+            ctype=self.ctype, slugs=self.get_list('types'),
+            object_ids=self.object_ids, start=self.get_date('start'),
+            end=self.get_date('end'))
+        response = StreamingHttpResponse(
+            iter_export(queryset, fmt), content_type=CONTENT_TYPES[fmt])
+        response['Content-Disposition'] = (
+            'attachment; filename="dated_values.{0}"'.format(fmt))
+        return response